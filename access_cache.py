@@ -0,0 +1,211 @@
+"""Plate -> entitlement cache for the gate access check.
+
+Every gate event used to look up the user by plate and their rent record
+before deciding.  `EntitlementCache` keeps the outcome of those lookups per
+plate as a small tuple so repeat decisions are answered from memory:
+
+* entries expire after `ttl` seconds (`negative_ttl` for unknown plates), or
+  earlier at the entitlement's own validity horizon;
+* `bind_invalidation` hooks SQLAlchemy session events so that a committed
+  change to any watched model (the gate binds users and rent records) drops
+  the cached entitlements at once.  That covers unit-of-work flushes and
+  ORM bulk ``update()``/``delete()``/``insert()`` statements on the watched
+  models; Core or textual SQL against their tables, and changes committed by
+  other processes, are only picked up once the TTL expires;
+* a generation counter stops a lookup that raced with an invalidation from
+  caching its stale result.
+
+`stats()` reports hits, misses, invalidations and size.
+
+`DecisionMemo` sits in front of it: a car idling at the gate makes the
+camera re-check the same plate every few seconds, and repeats within
+`window` seconds of a decision reuse it (and only bump the repeat counter of
+its log row) instead of deciding and logging again.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+ENTITLEMENT_CACHE_TTL = float(os.environ.get("ENTITLEMENT_CACHE_TTL", "60"))
+ENTITLEMENT_CACHE_NEGATIVE_TTL = float(os.environ.get("ENTITLEMENT_CACHE_NEGATIVE_TTL", "5"))
+ENTITLEMENT_CACHE_MAX_ENTRIES = int(os.environ.get("ENTITLEMENT_CACHE_MAX_ENTRIES", "100000"))
+# Seconds during which repeated checks of a plate at a door reuse the decision (0 disables).
+ACCESS_BURST_WINDOW = float(os.environ.get("ACCESS_BURST_WINDOW", "10"))
+
+
+class Entitlement(NamedTuple):
+    user_id: Optional[int]
+    user_name: Optional[str]
+    paid: bool
+    # Wall-clock time (UNIX seconds) after which `paid` must be re-checked.
+    valid_until: Optional[float] = None
+
+
+UNKNOWN = Entitlement(None, None, False)
+
+
+class EntitlementCache:
+    """Thread-safe plate -> `Entitlement` cache with TTL and explicit invalidation.
+
+    :param loader: ``loader(plate)`` returns an `Entitlement`, or None for
+        a plate that belongs to no user.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Optional[Entitlement]],
+        ttl: float = ENTITLEMENT_CACHE_TTL,
+        negative_ttl: float = ENTITLEMENT_CACHE_NEGATIVE_TTL,
+        max_entries: int = ENTITLEMENT_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.loader = loader
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        # Oldest stored first, so eviction is O(1).
+        self._entries: "OrderedDict[str, Tuple[Entitlement, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, plate: str) -> Entitlement:
+        entry = self._entries.get(plate)
+        if entry is not None:
+            if time.monotonic() < entry[1]:
+                self.hits += 1
+                return entry[0]
+            self.expired += 1
+        self.misses += 1
+        generation = self._generation
+        entitlement = self.loader(plate) or UNKNOWN
+        self._store(plate, entitlement, generation)
+        return entitlement
+
+    def _store(self, plate: str, entitlement: Entitlement, generation: int) -> None:
+        now = time.monotonic()
+        ttl = self.ttl if entitlement.user_id is not None else self.negative_ttl
+        if entitlement.valid_until is not None:
+            ttl = min(ttl, max(0.0, entitlement.valid_until - time.time()))
+        with self._lock:
+            if generation != self._generation:
+                return
+            if plate in self._entries:
+                self._entries.move_to_end(plate)
+            elif len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[plate] = (entitlement, now + ttl)
+
+    def invalidate(self, plate: Optional[str] = None) -> None:
+        """Drop one plate, or every entry when `plate` is None."""
+        with self._lock:
+            self._generation += 1
+            self.invalidations += 1
+            if plate is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(plate, None)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+class MemoizedDecision(NamedTuple):
+    body: Dict[str, Any]
+    status: int
+    # Handle of the log row to count repeats on (see access_log_writer.LogEntry).
+    log_entry: Any
+    expires: float
+
+
+class DecisionMemo:
+    """Short-lived (plate, door) -> `MemoizedDecision` memo for bursts of repeat checks.
+
+    The window runs from the original decision and is not extended by
+    repeats, so an idling car is decided afresh (and logged again) every
+    `window` seconds.
+    """
+
+    def __init__(self, window: float = ACCESS_BURST_WINDOW, max_entries: int = ENTITLEMENT_CACHE_MAX_ENTRIES) -> None:
+        self.window = window
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], MemoizedDecision] = {}
+        self._lock = threading.Lock()
+        self.repeats = 0
+
+    def get(self, plate: str, door: str) -> Optional[MemoizedDecision]:
+        decision = self._entries.get((plate, door))
+        if decision is None or time.monotonic() >= decision.expires:
+            return None
+        self.repeats += 1
+        return decision
+
+    def put(self, plate: str, door: str, body: Dict[str, Any], status: int, log_entry: Any) -> None:
+        if self.window <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {key: d for key, d in self._entries.items() if d.expires > now}
+                if len(self._entries) >= self.max_entries:
+                    return
+            self._entries[(plate, door)] = MemoizedDecision(body, status, log_entry, now + self.window)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, object]:
+        return {"size": len(self._entries), "repeats": self.repeats, "window": self.window}
+
+
+def bind_invalidation(watched_models, *callbacks: Callable[[], None]) -> None:
+    """Call every callback after a commit that changed an instance of `watched_models`.
+
+    Changes are collected at flush time, and from ORM bulk statements
+    (``session.execute(update(User)...)``, ``query.delete()``) as they run,
+    and applied only once the transaction commits; a rollback discards them.
+    Core statements on the bare tables are not seen.
+    """
+    watched_models = tuple(watched_models)
+    key = object()
+
+    @event.listens_for(Session, "after_flush")
+    def _collect(session, flush_context):
+        if any(isinstance(obj, watched_models) for obj in chain(session.new, session.dirty, session.deleted)):
+            session.info[key] = True
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _collect_bulk(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, watched_models):
+            orm_execute_state.session.info[key] = True
+
+    @event.listens_for(Session, "after_commit")
+    def _apply(session):
+        if session.info.pop(key, False):
+            for callback in callbacks:
+                callback()
+
+    @event.listens_for(Session, "after_rollback")
+    def _discard(session):
+        session.info.pop(key, None)
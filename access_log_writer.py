@@ -0,0 +1,289 @@
+"""Batched, off-request writer for gate access logs.
+
+The gate used to wait for ``INSERT ... ; COMMIT`` of its AccessLog row before
+answering.  `AccessLogWriter` moves that write off the decision path: rows
+are put on a bounded in-memory queue and a background thread inserts them in
+one bulk statement and one commit per batch, as soon as `batch_size` rows are
+queued or the oldest has waited `max_delay` seconds.
+
+How long the gate waits is set by the durability mode
+(``ACCESS_LOG_DURABILITY``):
+
+* ``async`` (default) - return as soon as the row is queued.  Rows still
+  queued when the process dies abruptly are lost; a normal shutdown flushes
+  them (atexit);
+* ``group`` - wait until the batch holding the row has committed (group
+  commit): as durable as ``sync``, but requests arriving while a commit is
+  in progress share the next one.  If the batch cannot be written, the row
+  is written inline, so the request fails just as under ``sync``;
+* ``sync`` - insert and commit inline, as before.
+
+When the queue is full the row is written inline rather than dropped, so an
+overloaded database slows the gate down instead of losing log entries.
+
+`write` returns a `LogEntry`; `bump(entry)` counts a repeat of that decision
+in the row's ``repeat_count``.  A repeat of a row still queued is folded
+into its INSERT; later repeats become batched ``repeat_count + n`` UPDATEs.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import bindparam, insert, update
+
+ACCESS_LOG_DURABILITY = os.environ.get("ACCESS_LOG_DURABILITY", "async").lower()
+ACCESS_LOG_BATCH_SIZE = int(os.environ.get("ACCESS_LOG_BATCH_SIZE", "200"))
+# Seconds the oldest queued row may wait before its batch is written.
+ACCESS_LOG_MAX_DELAY = float(os.environ.get("ACCESS_LOG_MAX_DELAY", "0.5"))
+ACCESS_LOG_QUEUE_SIZE = int(os.environ.get("ACCESS_LOG_QUEUE_SIZE", "10000"))
+# Seconds a ``group`` request waits for its commit before answering anyway.
+ACCESS_LOG_GROUP_TIMEOUT = float(os.environ.get("ACCESS_LOG_GROUP_TIMEOUT", "5"))
+
+DURABILITY_MODES = ("async", "group", "sync")
+# Attempts per batch before its rows are given up on.
+WRITE_ATTEMPTS = 3
+
+
+class LogEntry:
+    """One logged access decision; `id` is set once its row is inserted.
+
+    `failed` is set when its batch was given up on.
+    """
+
+    __slots__ = ("row", "id", "queued", "done", "failed")
+
+    def __init__(self, row: Dict, done: Optional[threading.Event] = None) -> None:
+        self.row = row
+        self.id: Optional[int] = None
+        self.queued = False
+        self.done = done
+        self.failed = False
+
+
+class AccessLogWriter:
+    """Queues AccessLog rows and group-commits them from a background thread.
+
+    The thread is started on the first `write` and runs inside the
+    application context of that request.
+    """
+
+    def __init__(
+        self,
+        db,
+        model,
+        durability: str = ACCESS_LOG_DURABILITY,
+        batch_size: int = ACCESS_LOG_BATCH_SIZE,
+        max_delay: float = ACCESS_LOG_MAX_DELAY,
+        max_pending: int = ACCESS_LOG_QUEUE_SIZE,
+        group_timeout: float = ACCESS_LOG_GROUP_TIMEOUT,
+    ) -> None:
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"ACCESS_LOG_DURABILITY must be one of {', '.join(DURABILITY_MODES)}, not {durability!r}")
+        self.db = db
+        self.model = model
+        self.durability = durability
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.group_timeout = group_timeout
+        # (entry, None) inserts the entry's row, (entry, n) adds n repeats to it.
+        self._pending: Deque[Tuple[LogEntry, Optional[int]]] = deque()
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._idle = threading.Condition(self._cond)
+        self._in_flight = 0
+        self._flush_requested = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._app = None
+        self.written = 0
+        self.batches = 0
+        self.inline = 0
+        self.failed = 0
+        self.repeats = 0
+
+    def write(self, **row) -> LogEntry:
+        """Log one access decision according to the durability mode."""
+        row.setdefault("repeat_count", 0)
+        entry = LogEntry(row, threading.Event() if self.durability == "group" else None)
+        if self.durability == "sync" or not self._enqueue(entry, None):
+            self._write_inline(entry)
+        elif entry.done is not None:
+            if not entry.done.wait(self.group_timeout):
+                print(f"[access-log] group commit still pending after {self.group_timeout}s")
+            elif entry.failed:
+                self._write_inline(entry)
+        return entry
+
+    def bump(self, entry: LogEntry, count: int = 1) -> None:
+        """Count `count` more repeats of the decision logged as `entry`."""
+        self.repeats += count
+        if self.durability != "sync":
+            with self._cond:
+                if entry.queued:
+                    entry.row["repeat_count"] += count
+                    return
+            if self._enqueue(entry, count):
+                return
+        if entry.id is not None:
+            self._bump_inline(entry.id, count)
+
+    def _enqueue(self, entry: LogEntry, count: Optional[int]) -> bool:
+        with self._cond:
+            if self._thread is None:
+                self._start()
+            if len(self._pending) >= self.max_pending or self._stop.is_set():
+                return False
+            if not self._pending:
+                self._oldest = time.monotonic()
+                # The writer sleeps without a deadline while the queue is empty.
+                self._cond.notify_all()
+            if count is None:
+                entry.queued = True
+            self._pending.append((entry, count))
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def _write_inline(self, entry: LogEntry) -> None:
+        log = self.model(**entry.row)
+        self.db.session.add(log)
+        self.db.session.flush()
+        entry.id = log.id
+        self.db.session.commit()
+        self.inline += 1
+
+    def _bump_inline(self, log_id: int, count: int) -> None:
+        table = self.model.__table__
+        self.db.session.execute(
+            update(table).where(table.c.id == log_id).values(repeat_count=table.c.repeat_count + count)
+        )
+        self.db.session.commit()
+
+    def _start(self) -> None:
+        self._app = current_app._get_current_object()
+        self._thread = threading.Thread(target=self._run, name="access-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Write everything still queued, then stop the background thread."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every row queued so far is written; False on timeout."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify_all()
+            try:
+                return self._idle.wait_for(lambda: not self._pending and not self._in_flight, timeout)
+            finally:
+                self._flush_requested = False
+
+    def _due(self) -> bool:
+        if len(self._pending) >= self.batch_size:
+            return True
+        if self.durability == "group" and self._pending:
+            # Requests are waiting: write now, rows queued meanwhile share the next commit.
+            return True
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+
+    def _wait_time(self) -> Optional[float]:
+        if self._oldest is None:
+            return None
+        return max(0.0, self.max_delay - (time.monotonic() - self._oldest))
+
+    def _take_batch(self) -> List[Tuple[LogEntry, Optional[int]]]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            item = self._pending.popleft()
+            item[0].queued = False
+            batch.append(item)
+        self._oldest = time.monotonic() if self._pending else None
+        return batch
+
+    def _run(self) -> None:
+        with self._app.app_context():
+            while True:
+                with self._cond:
+                    while not self._stop.is_set() and not self._due():
+                        if self._flush_requested and self._pending:
+                            break
+                        self._cond.wait(self._wait_time())
+                    if self._stop.is_set() and not self._pending:
+                        return
+                    batch = self._take_batch()
+                    self._in_flight = len(batch)
+                try:
+                    self._write_batch(batch)
+                finally:
+                    with self._cond:
+                        self._in_flight = 0
+                        self._idle.notify_all()
+                    self.db.session.remove()
+
+    def _write_batch(self, batch: List[Tuple[LogEntry, Optional[int]]]) -> None:
+        entries = [entry for entry, count in batch if count is None]
+        repeats: Counter = Counter()
+        for entry, count in batch:
+            # Entries whose INSERT failed have no id to update.
+            if count is not None and entry.id is not None:
+                repeats[entry.id] += count
+        table = self.model.__table__
+        self.batches += 1
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                ids = []
+                if entries:
+                    # One executemany INSERT for the whole batch.
+                    ids = self.db.session.execute(
+                        insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                        [entry.row for entry in entries],
+                    ).scalars().all()
+                if repeats:
+                    self.db.session.execute(
+                        update(table)
+                        .where(table.c.id == bindparam("_id"))
+                        .values(repeat_count=table.c.repeat_count + bindparam("_count")),
+                        [{"_id": log_id, "_count": count} for log_id, count in repeats.items()],
+                    )
+                self.db.session.commit()
+                for entry, log_id in zip(entries, ids):
+                    entry.id = log_id
+                self.written += len(entries)
+                break
+            except Exception as exc:
+                self.db.session.rollback()
+                print(f"[access-log] writing {len(batch)} change(s) failed (attempt {attempt}/{WRITE_ATTEMPTS}): {exc}")
+                if attempt == WRITE_ATTEMPTS:
+                    for entry in entries:
+                        entry.failed = True
+                    # Group requests write their rows inline instead.
+                    self.failed += sum(1 for entry in entries if entry.done is None)
+                else:
+                    time.sleep(0.2 * attempt)
+        for entry in entries:
+            if entry.done is not None:
+                entry.done.set()
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "durability": self.durability,
+            "pending": pending,
+            "written": self.written,
+            "batches": self.batches,
+            "inline": self.inline,
+            "failed": self.failed,
+            "repeats": self.repeats,
+        }
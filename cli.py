@@ -2,6 +2,8 @@ import click
 from flask.cli import with_appcontext
 from . import db
 from .models.user import User, UserRole  # fixed import
+from .estatecore_rollups import register_commands as register_rollup_commands
+from .parquet_export import register_commands as register_export_commands
 
 @click.command("create-superadmin")
 @click.argument("email")
@@ -21,3 +23,5 @@ def create_superadmin(email, password):
 
 def register_commands(app):
     app.cli.add_command(create_superadmin)
+    register_rollup_commands(app)
+    register_export_commands(app)
@@ -0,0 +1,10 @@
+"""
+EstateCore Rollups module
+- Incremental hourly/daily aggregates of LPR events and access logs
+- Chunked retention (delete or archive) of raw rows that are already rolled up
+"""
+
+from .rollups import update_rollups, update_lpr_rollups, update_access_rollups
+from .retention import purge_expired_rows
+from .routes import bp
+from .commands import register_commands
@@ -0,0 +1,23 @@
+import click
+from flask.cli import with_appcontext
+from .rollups import update_rollups
+from .retention import purge_expired_rows
+
+@click.command("rollups-update")
+@with_appcontext
+def rollups_update():
+    """Fold new LPR events and access logs into the hourly/daily rollups."""
+    for table, count in update_rollups().items():
+        click.echo(f"{table}: {count} new rows rolled up")
+
+@click.command("retention-purge")
+@with_appcontext
+def retention_purge():
+    """Roll up, then delete (or archive) raw rows past their retention age."""
+    update_rollups()
+    for table, count in purge_expired_rows().items():
+        click.echo(f"{table}: {count} rows removed")
+
+def register_commands(app):
+    app.cli.add_command(rollups_update)
+    app.cli.add_command(retention_purge)
@@ -0,0 +1,32 @@
+import os
+
+# Raw rows aggregated per transaction by the rollup engine
+ROLLUP_CHUNK_SIZE = int(os.environ.get("ROLLUP_CHUNK_SIZE", "5000"))
+
+# Reading the rollup API folds in new rows first if the last update is older than this (0 disables)
+ROLLUP_REFRESH_SECONDS = float(os.environ.get("ROLLUP_REFRESH_SECONDS", "60"))
+
+# Most raw rows per source such a refresh folds (0 = no cap); the rest waits for later reads or `flask rollups-update`
+ROLLUP_REFRESH_MAX_ROWS = int(os.environ.get("ROLLUP_REFRESH_MAX_ROWS", "5000"))
+
+# Rows are folded only up to the highest id seen at least this long ago (seconds): ids are handed out
+# before commit, so a lower id can become visible after a higher one and must not fall behind the watermark
+ROLLUP_COMMIT_LAG = float(os.environ.get("ROLLUP_COMMIT_LAG", "30"))
+
+# Access log rows younger than this (seconds) are folded on a later run, so repeats of a gate
+# decision counted into the row (ACCESS_BURST_WINDOW plus writer delay) are included
+ROLLUP_ACCESS_LOG_LAG = float(os.environ.get("ROLLUP_ACCESS_LOG_LAG", "30"))
+
+# Rollup granularities maintained for every source
+ROLLUP_PERIODS = ("hour", "day")
+
+# Raw rows older than this many days are removed by the retention job (0 keeps forever)
+LPR_EVENT_RETENTION_DAYS = int(os.environ.get("LPR_EVENT_RETENTION_DAYS", "90"))
+ACCESS_LOG_RETENTION_DAYS = int(os.environ.get("ACCESS_LOG_RETENTION_DAYS", "365"))
+
+# Rows deleted per transaction, and the pause between chunks (seconds)
+RETENTION_CHUNK_SIZE = int(os.environ.get("RETENTION_CHUNK_SIZE", "1000"))
+RETENTION_CHUNK_PAUSE = float(os.environ.get("RETENTION_CHUNK_PAUSE", "0.05"))
+
+# When set, purged rows are appended to gzip'd JSON-lines files here before deletion
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
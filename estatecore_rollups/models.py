@@ -0,0 +1,61 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index, UniqueConstraint
+from estatecore_backend.models import db
+
+class LPRRollup(db.Model):
+    __tablename__ = "lpr_rollups"
+    id = Column(Integer, primary_key=True)
+    period = Column(String(8), nullable=False)            # hour/day
+    bucket_start = Column(DateTime, nullable=False)       # UTC start of the bucket
+    camera = Column(String(64), nullable=False, default="")
+    events = Column(Integer, default=0)
+    unique_plates = Column(Integer, default=0)
+    confidence_sum = Column(Float, default=0.0)
+    confidence_count = Column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "camera", name="uq_lpr_rollups_bucket"),
+    )
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.confidence_count if self.confidence_count else None
+
+class AccessRollup(db.Model):
+    __tablename__ = "access_rollups"
+    id = Column(Integer, primary_key=True)
+    period = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    door = Column(String(64), nullable=False, default="")
+    attempts = Column(Integer, default=0)
+    granted = Column(Integer, default=0)
+    denied = Column(Integer, default=0)
+    unique_users = Column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("period", "bucket_start", "door", name="uq_access_rollups_bucket"),
+    )
+
+class RollupMember(db.Model):
+    """Distinct plates/users already counted in a bucket, so unique counts stay exact
+    when later chunks (or late events) land in the same bucket."""
+    __tablename__ = "rollup_members"
+    id = Column(Integer, primary_key=True)
+    source = Column(String(16), nullable=False)           # lpr/access
+    period = Column(String(8), nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    dimension = Column(String(64), nullable=False)        # camera or door
+    member = Column(String(120), nullable=False)          # plate or user
+
+    __table_args__ = (
+        UniqueConstraint("source", "period", "bucket_start", "dimension", "member", name="uq_rollup_members"),
+        Index("ix_rollup_members_bucket", "source", "bucket_start"),
+    )
+
+class RollupWatermark(db.Model):
+    __tablename__ = "rollup_watermarks"
+    name = Column(String(32), primary_key=True)           # source table
+    last_id = Column(Integer, nullable=False, default=0)
+    seen_id = Column(Integer)                             # highest id at seen_at; folded once ROLLUP_COMMIT_LAG has passed
+    seen_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
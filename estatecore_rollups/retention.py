@@ -0,0 +1,77 @@
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from .config import (
+    ACCESS_LOG_RETENTION_DAYS, LPR_EVENT_RETENTION_DAYS, RETENTION_ARCHIVE_DIR,
+    RETENTION_CHUNK_PAUSE, RETENTION_CHUNK_SIZE,
+)
+from .models import db, RollupMember, RollupWatermark
+from estatecore_backend.models import LPREvent, AccessLog
+
+def _archive_rows(table, rows):
+    """Append rows to <RETENTION_ARCHIVE_DIR>/<table>-<YYYY-MM-DD>.jsonl.gz."""
+    os.makedirs(RETENTION_ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(RETENTION_ARCHIVE_DIR, f"{table}-{datetime.utcnow():%Y-%m-%d}.jsonl.gz")
+    columns = [c.name for c in rows[0].__table__.columns]
+    with gzip.open(path, "at", encoding="utf-8") as fh:
+        for row in rows:
+            fh.write(json.dumps({c: getattr(row, c) for c in columns}, default=str) + "\n")
+
+def _purge(model, condition, watermark_name, chunk_size, pause):
+    """Delete rows matching `condition` in id-ordered chunks, one commit each.
+
+    Rows the rollup engine has not folded yet (id above its watermark) are
+    never deleted, so the rollups stay complete.
+    """
+    wm = RollupWatermark.query.filter_by(name=watermark_name).first()
+    max_id = wm.last_id if wm else 0
+    deleted = 0
+    while True:
+        query = model.query.filter(condition, model.id <= max_id).order_by(model.id).limit(chunk_size)
+        if RETENTION_ARCHIVE_DIR:
+            rows = query.all()
+            ids = [r.id for r in rows]
+        else:
+            rows, ids = None, [i for (i,) in query.with_entities(model.id)]
+        if not ids:
+            break
+        if rows:
+            _archive_rows(model.__tablename__, rows)
+        model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        if len(ids) < chunk_size:
+            break
+        time.sleep(pause)
+    return deleted
+
+def _purge_members(source, cutoff, chunk_size, pause):
+    """Drop distinct-member rows of buckets older than the raw data behind them."""
+    deleted = 0
+    while True:
+        ids = [i for (i,) in db.session.query(RollupMember.id).filter(
+            RollupMember.source == source, RollupMember.bucket_start < cutoff,
+        ).limit(chunk_size)]
+        if not ids:
+            break
+        RollupMember.query.filter(RollupMember.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        deleted += len(ids)
+        time.sleep(pause)
+    return deleted
+
+def purge_expired_rows(chunk_size=RETENTION_CHUNK_SIZE, pause=RETENTION_CHUNK_PAUSE, now=None):
+    """Apply the retention policy to LPR events and access logs; returns rows removed per table."""
+    now = now or datetime.utcnow()
+    result = {}
+    if LPR_EVENT_RETENTION_DAYS:
+        cutoff = now - timedelta(days=LPR_EVENT_RETENTION_DAYS)
+        result["lpr_event"] = _purge(LPREvent, LPREvent.timestamp < cutoff, "lpr_event", chunk_size, pause)
+        result["lpr_members"] = _purge_members("lpr", cutoff - timedelta(days=1), chunk_size, pause)
+    if ACCESS_LOG_RETENTION_DAYS:
+        cutoff = now - timedelta(days=ACCESS_LOG_RETENTION_DAYS)
+        result["access_log"] = _purge(AccessLog, AccessLog.timestamp < cutoff, "access_log", chunk_size, pause)
+        result["access_members"] = _purge_members("access", cutoff - timedelta(days=1), chunk_size, pause)
+    return result
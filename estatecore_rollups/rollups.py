@@ -0,0 +1,171 @@
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from .config import ROLLUP_ACCESS_LOG_LAG, ROLLUP_CHUNK_SIZE, ROLLUP_COMMIT_LAG, ROLLUP_PERIODS
+from .models import db, LPRRollup, AccessRollup, RollupMember, RollupWatermark
+from estatecore_backend.models import LPREvent, AccessLog
+
+def bucket_start(ts, period):
+    if period == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _watermark(name):
+    # Row lock so two rollup runs cannot fold the same chunk twice.
+    wm = RollupWatermark.query.filter_by(name=name).with_for_update().first()
+    if not wm:
+        wm = RollupWatermark(name=name, last_id=0)
+        db.session.add(wm)
+    return wm
+
+def _new_members(source, period, bucket, dimension, members):
+    """Record bucket members not counted yet; returns how many were new."""
+    if not members:
+        return 0
+    existing = {m for (m,) in db.session.query(RollupMember.member).filter(
+        RollupMember.source == source,
+        RollupMember.period == period,
+        RollupMember.bucket_start == bucket,
+        RollupMember.dimension == dimension,
+        RollupMember.member.in_(list(members)),
+    )}
+    new = [m for m in members if m not in existing]
+    db.session.add_all(
+        RollupMember(source=source, period=period, bucket_start=bucket, dimension=dimension, member=m)
+        for m in new
+    )
+    return len(new)
+
+def _fold_new_rows(source, model, chunk_size, group_fn, apply_fn, max_rows=None, ready_fn=None):
+    """Aggregate rows past the `source` watermark in chunks of `chunk_size`.
+
+    `group_fn(row, groups)` adds a row to the in-memory groups and
+    `apply_fn(key, group)` merges one group into its rollup row.  The rollups
+    and the advanced watermark are committed together, chunk by chunk.  With
+    `max_rows` set, at most that many rows are folded; the rest stays past
+    the watermark for the next run, as does everything from the first row
+    for which `ready_fn(row)` is false.
+
+    Only ids up to the highest one seen `ROLLUP_COMMIT_LAG` seconds ago are
+    folded, so a transaction that took a lower id but commits after a higher
+    one still lands above the watermark.  Once those are folded, the current
+    highest id is recorded for a later run.
+    """
+    processed = 0
+    wm = _watermark(source)
+    settled = wm.seen_at is not None and wm.seen_at <= datetime.utcnow() - timedelta(seconds=ROLLUP_COMMIT_LAG)
+    caught_up = wm.seen_at is None
+    while settled and (max_rows is None or processed < max_rows):
+        if max_rows is not None:
+            chunk_size = min(chunk_size, max_rows - processed)
+        wm = _watermark(source)
+        rows = model.query.filter(model.id > wm.last_id, model.id <= wm.seen_id).order_by(model.id).limit(chunk_size).all()
+        cut = None
+        if ready_fn is not None:
+            cut = next((i for i, row in enumerate(rows) if not ready_fn(row)), None)
+            if cut is not None:
+                rows = rows[:cut]
+        if not rows:
+            caught_up = cut is None
+            break
+        groups = {}
+        for row in rows:
+            group_fn(row, groups)
+        for key, group in groups.items():
+            apply_fn(key, group)
+        wm.last_id = rows[-1].id
+        db.session.commit()
+        processed += len(rows)
+        if cut is not None or len(rows) < chunk_size:
+            caught_up = cut is None
+            break
+    if caught_up:
+        wm = _watermark(source)
+        wm.seen_id = max(db.session.query(func.max(model.id)).scalar() or 0, wm.last_id)
+        wm.seen_at = datetime.utcnow()
+    db.session.commit()
+    return processed
+
+def update_lpr_rollups(chunk_size=ROLLUP_CHUNK_SIZE, max_rows=None):
+    """Fold new LPR events into per-camera hourly/daily rollups; returns rows folded."""
+
+    def group(ev, groups):
+        ts = ev.timestamp or ev.created_at
+        if ts is None:
+            return
+        for period in ROLLUP_PERIODS:
+            g = groups.setdefault((period, bucket_start(ts, period), ev.camera or ""), {
+                "events": 0, "confidence_sum": 0.0, "confidence_count": 0, "plates": set(),
+            })
+            g["events"] += 1
+            g["plates"].add(ev.plate)
+            if ev.confidence is not None:
+                g["confidence_sum"] += ev.confidence
+                g["confidence_count"] += 1
+
+    def apply(key, g):
+        period, bucket, camera = key
+        row = LPRRollup.query.filter_by(period=period, bucket_start=bucket, camera=camera).first()
+        if not row:
+            row = LPRRollup(period=period, bucket_start=bucket, camera=camera,
+                            events=0, unique_plates=0, confidence_sum=0.0, confidence_count=0)
+            db.session.add(row)
+        row.events += g["events"]
+        row.confidence_sum += g["confidence_sum"]
+        row.confidence_count += g["confidence_count"]
+        row.unique_plates += _new_members("lpr", period, bucket, camera, g["plates"])
+
+    return _fold_new_rows("lpr_event", LPREvent, chunk_size, group, apply, max_rows)
+
+def update_access_rollups(chunk_size=ROLLUP_CHUNK_SIZE, max_rows=None):
+    """Fold new access log rows into per-door hourly/daily rollups; returns rows folded.
+
+    A row stands for ``1 + repeat_count`` attempts: repeats of a gate decision
+    are counted into the original row instead of being logged.  Rows are
+    folded once, so rows still inside `ROLLUP_ACCESS_LOG_LAG` are left for a
+    later run; a repeat counted after its row was folded is not in the rollup.
+    """
+    now = datetime.utcnow()
+    horizon = now - timedelta(seconds=ROLLUP_ACCESS_LOG_LAG)
+
+    def ready(log):
+        # Simulated rows dated in the future are never bumped.
+        return log.timestamp is None or not horizon < log.timestamp <= now
+
+    def group(log, groups):
+        ts = log.timestamp
+        if ts is None:
+            return
+        status = (log.status or "").lower()
+        attempts = 1 + (log.repeat_count or 0)
+        for period in ROLLUP_PERIODS:
+            g = groups.setdefault((period, bucket_start(ts, period), log.door or ""), {
+                "attempts": 0, "granted": 0, "denied": 0, "users": set(),
+            })
+            g["attempts"] += attempts
+            if status == "granted":
+                g["granted"] += attempts
+            elif status.startswith("denied"):
+                g["denied"] += attempts
+            if log.user:
+                g["users"].add(log.user[:120])
+
+    def apply(key, g):
+        period, bucket, door = key
+        row = AccessRollup.query.filter_by(period=period, bucket_start=bucket, door=door).first()
+        if not row:
+            row = AccessRollup(period=period, bucket_start=bucket, door=door,
+                               attempts=0, granted=0, denied=0, unique_users=0)
+            db.session.add(row)
+        row.attempts += g["attempts"]
+        row.granted += g["granted"]
+        row.denied += g["denied"]
+        row.unique_users += _new_members("access", period, bucket, door, g["users"])
+
+    return _fold_new_rows("access_log", AccessLog, chunk_size, group, apply, max_rows, ready)
+
+def update_rollups(chunk_size=ROLLUP_CHUNK_SIZE, max_rows=None):
+    """Fold new rows of every source, at most `max_rows` per source if set."""
+    return {
+        "lpr_event": update_lpr_rollups(chunk_size, max_rows),
+        "access_log": update_access_rollups(chunk_size, max_rows),
+    }
@@ -0,0 +1,78 @@
+import threading
+import time
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required
+from .config import ROLLUP_REFRESH_MAX_ROWS, ROLLUP_REFRESH_SECONDS
+from .models import LPRRollup, AccessRollup
+from .rollups import update_rollups
+from estatecore_backend.utils.timeparse import parse_utc_time
+
+bp = Blueprint("estatecore_rollups", __name__, url_prefix="/api/rollups")
+
+_last_refresh = 0.0
+_refresh_lock = threading.Lock()
+
+@bp.before_request
+def refresh_rollups():
+    """Keep rollups fresh for dashboards without a separate cron job.
+
+    Each refresh folds a bounded number of rows so a read never waits on a
+    large backlog; `flask rollups-update` (cron/scheduler) catches up fully.
+    """
+    global _last_refresh
+    if not ROLLUP_REFRESH_SECONDS or request.method != "GET":
+        return
+    if not _refresh_lock.acquire(blocking=False):
+        return
+    try:
+        if time.monotonic() - _last_refresh >= ROLLUP_REFRESH_SECONDS:
+            update_rollups(max_rows=ROLLUP_REFRESH_MAX_ROWS or None)
+            _last_refresh = time.monotonic()
+    finally:
+        _refresh_lock.release()
+
+def _filtered(model, dimension_column):
+    """Rollup rows for ?period=hour|day&since=&until=&<dimension>=, newest bucket first."""
+    q = model.query.filter_by(period=request.args.get("period", "hour"))
+    if request.args.get(dimension_column) is not None:
+        q = q.filter(getattr(model, dimension_column) == request.args[dimension_column])
+    if request.args.get("since"):
+        q = q.filter(model.bucket_start >= parse_utc_time(request.args["since"]))
+    if request.args.get("until"):
+        q = q.filter(model.bucket_start < parse_utc_time(request.args["until"]))
+    limit = max(1, min(request.args.get("limit", 500, type=int), 5000))
+    return q.order_by(model.bucket_start.desc()).limit(limit).all()
+
+@bp.route("/lpr", methods=["GET"])
+def api_lpr_rollups():
+    try:
+        rows = _filtered(LPRRollup, "camera")
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    return jsonify([{
+        "bucket_start": r.bucket_start.isoformat(),
+        "camera": r.camera,
+        "events": r.events,
+        "unique_plates": r.unique_plates,
+        "mean_confidence": r.mean_confidence,
+    } for r in rows])
+
+@bp.route("/access", methods=["GET"])
+def api_access_rollups():
+    try:
+        rows = _filtered(AccessRollup, "door")
+    except ValueError as exc:
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    return jsonify([{
+        "bucket_start": r.bucket_start.isoformat(),
+        "door": r.door,
+        "attempts": r.attempts,
+        "granted": r.granted,
+        "denied": r.denied,
+        "unique_users": r.unique_users,
+    } for r in rows])
+
+@bp.route("/update", methods=["POST"])
+@jwt_required()
+def api_update_rollups():
+    return jsonify({"ok": True, "processed": update_rollups()})
@@ -0,0 +1,299 @@
+"""Offline allowlist of entitled plates for edge gate controllers.
+
+Every gate decision used to need a round trip to the backend and its
+database.  The backend now compiles the plates currently entitled to enter
+into a compact, versioned snapshot; gate boxes download it once, keep it up
+to date with small deltas and decide locally, so they keep working through
+backend outages.
+
+Snapshot format (little endian)::
+
+    header   "GALW" | u16 format | 8-byte version | f64 generated_at | u32 count
+    records  count x (16s plate | u32 user_id | u8 flags)
+
+Records are sorted by normalized plate, so firmware can binary-search the
+buffer in place; this module decodes it into dicts.
+`FLAG_CANONICAL_UNIQUE` marks plates that no other registered plate equals
+up to OCR confusions; only those may match a misread plate, exactly like
+`routes.find_user_by_plate`.  The version is a hash of the records, so
+equal contents have equal versions in every backend process and a client
+can verify a snapshot rebuilt from a delta.
+
+`generated_at` is refreshed on every recompile even when the records did
+not change, so it tells how current the gate's copy is.  A gate box whose
+snapshot is older than `GATE_ALLOWLIST_MAX_AGE` (it could not sync for that
+long) denies every plate until it syncs again, instead of honouring
+entitlements that may have been revoked meanwhile.
+
+Edge usage::
+
+    python gate_allowlist.py --url https://backend --token $JWT --cache allowlist.bin ABC123
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    from .plate_search import canonical_plate, normalize_plate
+except ImportError:  # run standalone on a gate box
+    from plate_search import canonical_plate, normalize_plate
+
+# Seconds before the backend recompiles the snapshot (sooner after invalidation).
+GATE_ALLOWLIST_REFRESH = float(os.environ.get("GATE_ALLOWLIST_REFRESH", "30"))
+# Number of past snapshots kept so that clients on them get a delta.
+GATE_ALLOWLIST_HISTORY = int(os.environ.get("GATE_ALLOWLIST_HISTORY", "32"))
+# Seconds after generation a gate box still trusts a snapshot (0 = forever).
+GATE_ALLOWLIST_MAX_AGE = float(os.environ.get("GATE_ALLOWLIST_MAX_AGE", "86400"))
+
+MAGIC = b"GALW"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<4sH8sdI")
+RECORD = struct.Struct("<16sIB")
+MAX_PLATE_LENGTH = 16
+FLAG_CANONICAL_UNIQUE = 1
+
+
+class Record(NamedTuple):
+    user_id: int
+    flags: int
+
+
+class Snapshot(NamedTuple):
+    version: str
+    generated_at: float
+    records: Dict[str, Record]
+    data: bytes
+
+
+def _encode_records(records: Dict[str, Record]) -> bytes:
+    return b"".join(
+        RECORD.pack(plate.encode("ascii"), *records[plate]) for plate in sorted(records)
+    )
+
+
+def encode(records: Dict[str, Record], generated_at: float) -> Snapshot:
+    body = _encode_records(records)
+    version = hashlib.sha256(body).digest()[:8]
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, version, generated_at, len(records))
+    return Snapshot(version.hex(), generated_at, dict(records), header + body)
+
+
+def decode(data: bytes) -> Snapshot:
+    """Parse and verify a snapshot produced by `encode`."""
+    magic, fmt, version, generated_at, count = HEADER.unpack_from(data)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        raise ValueError("not an allowlist snapshot (or unsupported format)")
+    body = data[HEADER.size:]
+    if len(body) != count * RECORD.size or hashlib.sha256(body).digest()[:8] != version:
+        raise ValueError("allowlist snapshot is corrupt")
+    records = {}
+    for plate, user_id, flags in RECORD.iter_unpack(body):
+        records[plate.rstrip(b"\0").decode("ascii")] = Record(user_id, flags)
+    return Snapshot(version.hex(), generated_at, records, bytes(data))
+
+
+def compile_snapshot(
+    entitled: Iterable[Tuple[str, int]],
+    registered_plates: Iterable[str],
+    generated_at: Optional[float] = None,
+) -> Snapshot:
+    """Build a snapshot from ``(plate, user_id)`` entitlements.
+
+    `registered_plates` are all plates on file, entitled or not; they decide
+    which plates are unique up to OCR confusions.
+    """
+    canonical_counts = Counter(canonical_plate(plate) for plate in registered_plates if plate)
+    records: Dict[str, Record] = {}
+    for plate, user_id in entitled:
+        normalized = normalize_plate(plate)
+        if not normalized or normalized in records:
+            continue
+        if len(normalized) > MAX_PLATE_LENGTH:
+            print(f"[allowlist] skipping plate longer than {MAX_PLATE_LENGTH} characters: {plate}")
+            continue
+        flags = FLAG_CANONICAL_UNIQUE if canonical_counts[canonical_plate(plate)] == 1 else 0
+        records[normalized] = Record(user_id, flags)
+    return encode(records, time.time() if generated_at is None else generated_at)
+
+
+def make_delta(base: Snapshot, target: Snapshot) -> Dict:
+    return {
+        "base": base.version,
+        "version": target.version,
+        "generated_at": target.generated_at,
+        "upsert": {
+            plate: list(record)
+            for plate, record in target.records.items()
+            if base.records.get(plate) != record
+        },
+        "remove": sorted(plate for plate in base.records if plate not in target.records),
+    }
+
+
+def apply_delta(snapshot: Snapshot, delta: Dict) -> Snapshot:
+    """Apply a delta from `make_delta`; raises ValueError if it does not fit."""
+    if delta["base"] != snapshot.version:
+        raise ValueError(f"delta is based on {delta['base']}, not {snapshot.version}")
+    records = dict(snapshot.records)
+    for plate in delta["remove"]:
+        records.pop(plate, None)
+    for plate, record in delta["upsert"].items():
+        records[plate] = Record(*record)
+    updated = encode(records, delta["generated_at"])
+    if updated.version != delta["version"]:
+        raise ValueError("allowlist delta did not reproduce the expected version")
+    return updated
+
+
+class AllowlistPublisher:
+    """Backend side: the current snapshot plus recent ones to diff against.
+
+    :param loader: returns ``(entitled, registered_plates)`` as taken by
+        `compile_snapshot`.
+    """
+
+    def __init__(self, loader, refresh: float = GATE_ALLOWLIST_REFRESH, history: int = GATE_ALLOWLIST_HISTORY) -> None:
+        self.loader = loader
+        self.refresh = refresh
+        self._history: "OrderedDict[str, Snapshot]" = OrderedDict()
+        self._max_history = max(1, history)
+        self._current: Optional[Snapshot] = None
+        self._built = float("-inf")
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Recompile on the next request instead of after `refresh` seconds."""
+        self._built = float("-inf")
+
+    def current(self) -> Snapshot:
+        with self._lock:
+            if self._current is None or time.monotonic() - self._built >= self.refresh:
+                entitled, registered = self.loader()
+                # Replaced even when unchanged, so `generated_at` stays fresh.
+                snapshot = self._current = compile_snapshot(entitled, registered)
+                self._history.pop(snapshot.version, None)
+                self._history[snapshot.version] = snapshot
+                while len(self._history) > self._max_history:
+                    self._history.popitem(last=False)
+                self._built = time.monotonic()
+            return self._current
+
+    def delta(self, since: str) -> Optional[Dict]:
+        """Changes from snapshot `since` to the current one; None if `since` is unknown."""
+        current = self.current()
+        with self._lock:
+            base = self._history.get(since)
+        if base is None:
+            return None
+        return make_delta(base, current)
+
+
+class AllowlistEvaluator:
+    """Gate side: local decisions from the last snapshot received.
+
+    Once the snapshot is more than `max_age` seconds old every plate is
+    denied; sync and build a new evaluator to recover.
+    """
+
+    def __init__(self, snapshot: Snapshot, max_age: float = GATE_ALLOWLIST_MAX_AGE) -> None:
+        self.snapshot = snapshot
+        self.max_age = max_age
+        self._by_canonical = {
+            canonical_plate(plate): record
+            for plate, record in snapshot.records.items()
+            if record.flags & FLAG_CANONICAL_UNIQUE
+        }
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.snapshot.generated_at
+
+    def stale(self, now: Optional[float] = None) -> bool:
+        return bool(self.max_age) and self.age(now) > self.max_age
+
+    def check(self, plate: str, now: Optional[float] = None) -> Optional[Record]:
+        """The entitlement for `plate` if it may enter at `now`, else None."""
+        if self.stale(now):
+            return None
+        record = self.snapshot.records.get(normalize_plate(plate))
+        if record is None:
+            record = self._by_canonical.get(canonical_plate(plate))
+        return record
+
+
+def load(path: str) -> Optional[Snapshot]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as fh:
+        return decode(fh.read())
+
+
+def save(path: str, snapshot: Snapshot) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(snapshot.data)
+    os.replace(tmp, path)
+
+
+def sync(base_url: str, token: str, current: Optional[Snapshot] = None, timeout: float = 5.0) -> Snapshot:
+    """Bring `current` up to date from the backend (delta if possible).
+
+    Network errors propagate; a gate box should catch them and keep using
+    `current`.
+    """
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+
+    headers = {"Authorization": f"Bearer {token}"}
+    base_url = base_url.rstrip("/")
+    if current is not None:
+        url = f"{base_url}/access/allowlist/delta?since={current.version}"
+        try:
+            with urlopen(Request(url, headers=headers), timeout=timeout) as resp:
+                return apply_delta(current, json.load(resp))
+        except HTTPError as exc:
+            if exc.code != 410:
+                raise
+        except ValueError as exc:
+            print(f"[allowlist] delta rejected, downloading full snapshot: {exc}")
+    with urlopen(Request(f"{base_url}/access/allowlist", headers=headers), timeout=timeout) as resp:
+        return decode(resp.read())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the gate allowlist and check plates locally.")
+    parser.add_argument("plates", nargs="*")
+    parser.add_argument("--url", help="backend base URL (omit to use the cached snapshot only)")
+    parser.add_argument("--token", default=os.environ.get("GATE_ALLOWLIST_TOKEN", ""))
+    parser.add_argument("--cache", default="allowlist.bin")
+    args = parser.parse_args()
+    try:
+        snapshot = load(args.cache)
+    except (struct.error, ValueError) as exc:
+        print(f"Ignoring unreadable cached snapshot: {exc}")
+        snapshot = None
+    if args.url:
+        try:
+            snapshot = sync(args.url, args.token, snapshot)
+            save(args.cache, snapshot)
+        except OSError as exc:
+            print(f"Sync failed, using cached snapshot: {exc}")
+    if snapshot is None:
+        raise SystemExit("No allowlist snapshot available.")
+    evaluator = AllowlistEvaluator(snapshot)
+    print(f"Snapshot {evaluator.version}: {len(snapshot.records)} plates, {evaluator.age():.0f}s old")
+    if evaluator.stale():
+        print(f"Snapshot is older than {evaluator.max_age:.0f}s; denying every plate until a sync succeeds.")
+    for plate in args.plates:
+        record = evaluator.check(plate)
+        print(f"{plate}: " + (f"granted (user {record.user_id})" if record else "denied"))
@@ -0,0 +1,253 @@
+"""Size-capped, deduplicated archive of LPR frames.
+
+Frames are stored per camera in day buckets, named by their content::
+
+    <root>/<camera>/<YYYY-MM-DD>/<key>.jpg
+
+Plate-positive frames are evidence and are keyed by a hash of their exact
+JPEG bytes, so only byte-identical frames share a file.  Context frames
+(no plate) are keyed by a hash of a coarse grayscale thumbnail instead, so
+repeated frames of a static scene map to one file however much sensor
+noise changes the JPEG bytes.  Every stored frame is also appended to a compact binary
+index (``<root>/<camera>/index.bin``, one fixed-size record per frame) that
+is loaded into memory at startup; `find` locates the frame nearest to a
+timestamp with a binary search.
+
+Each camera has a byte cap.  When it is exceeded the oldest index records
+are evicted ring-buffer style and files no longer referenced are deleted.
+
+Plate-positive frames are kept at full quality; other frames (kept for
+context) are re-encoded small and at low JPEG quality.
+"""
+
+import argparse
+import bisect
+import hashlib
+import os
+import re
+import struct
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from lpr_recognizer import encode_frame
+
+# Index record: timestamp (float64), content key (20 bytes), stored size.
+_RECORD = struct.Struct("<d20sI")
+# Width and JPEG quality of frames archived without a plate.
+CONTEXT_MAX_WIDTH = 480
+CONTEXT_QUALITY = 50
+
+
+def content_key(jpeg: bytes) -> bytes:
+    """20-byte key of the exact JPEG bytes."""
+    return hashlib.sha1(jpeg).digest()
+
+
+def perceptual_key(jpeg: bytes) -> bytes:
+    """20-byte key of a JPEG that ignores noise-level differences."""
+    thumb = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if thumb is None:
+        return hashlib.sha1(jpeg).digest()
+    thumb = cv2.resize(thumb, (32, 32), interpolation=cv2.INTER_AREA)
+    return hashlib.sha1((thumb >> 4).tobytes()).digest()
+
+
+def _day(timestamp: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+class _CameraIndex:
+    """Timestamp-ordered records of one camera plus reference counts."""
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.path = os.path.join(directory, "index.bin")
+        self.times: List[float] = []
+        self.keys: List[bytes] = []
+        self.sizes: List[int] = []
+        self.refs: Dict[Tuple[str, bytes], int] = {}
+        self.total_bytes = 0
+        self.evicted_since_compact = 0
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.path):
+            self._load()
+        self._fh = open(self.path, "ab")
+
+    def _load(self) -> None:
+        with open(self.path, "rb") as fh:
+            data = fh.read()
+        records = [_RECORD.unpack_from(data, off) for off in range(0, len(data) - _RECORD.size + 1, _RECORD.size)]
+        records.sort(key=lambda r: r[0])
+        for timestamp, key, size in records:
+            self._insert(timestamp, key, size)
+
+    def _insert(self, timestamp: float, key: bytes, size: int) -> bool:
+        """Add a record in timestamp order; True if its file is new."""
+        pos = bisect.bisect_right(self.times, timestamp)
+        self.times.insert(pos, timestamp)
+        self.keys.insert(pos, key)
+        self.sizes.insert(pos, size)
+        ref = (_day(timestamp), key)
+        self.refs[ref] = self.refs.get(ref, 0) + 1
+        if self.refs[ref] == 1:
+            self.total_bytes += size
+            return True
+        return False
+
+    def file_path(self, timestamp: float, key: bytes) -> str:
+        return os.path.join(self.directory, _day(timestamp), key.hex() + ".jpg")
+
+    def append(self, timestamp: float, key: bytes, size: int) -> None:
+        self._insert(timestamp, key, size)
+        self._fh.write(_RECORD.pack(timestamp, key, size))
+        self._fh.flush()
+
+    def evict_to(self, max_bytes: int) -> int:
+        """Drop the oldest records until under `max_bytes`; returns files deleted."""
+        count = 0
+        deleted = 0
+        while self.total_bytes > max_bytes and count < len(self.times):
+            timestamp, key, size = self.times[count], self.keys[count], self.sizes[count]
+            count += 1
+            ref = (_day(timestamp), key)
+            self.refs[ref] -= 1
+            if self.refs[ref] == 0:
+                del self.refs[ref]
+                self.total_bytes -= size
+                try:
+                    os.remove(self.file_path(timestamp, key))
+                    deleted += 1
+                except FileNotFoundError:
+                    pass
+        if count:
+            del self.times[:count], self.keys[:count], self.sizes[:count]
+            self.evicted_since_compact += count
+            if self.evicted_since_compact > len(self.times):
+                self._compact()
+        return deleted
+
+    def _compact(self) -> None:
+        """Rewrite the index file without evicted records."""
+        self._fh.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as fh:
+            for record in zip(self.times, self.keys, self.sizes):
+                fh.write(_RECORD.pack(*record))
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, "ab")
+        self.evicted_since_compact = 0
+
+    def close(self) -> None:
+        self._fh.close()
+
+
+class FrameArchive:
+    """Content-addressed frame store with a per-camera size cap.
+
+    :param max_bytes_per_camera: disk budget per camera; 0 disables the cap.
+    """
+
+    def __init__(self, root: str, max_bytes_per_camera: int = 0) -> None:
+        self.root = root
+        self.max_bytes_per_camera = max_bytes_per_camera
+        self._lock = threading.Lock()
+        self._cameras: Dict[str, _CameraIndex] = {}
+        self.stored = 0
+        self.deduplicated = 0
+        self.evicted = 0
+        os.makedirs(root, exist_ok=True)
+
+    def _index(self, camera: str) -> _CameraIndex:
+        index = self._cameras.get(camera)
+        if index is None:
+            safe = re.sub(r"[^A-Za-z0-9_.-]", "_", camera) or "_"
+            index = self._cameras[camera] = _CameraIndex(os.path.join(self.root, safe))
+            if self.max_bytes_per_camera:
+                # The index file may still list records evicted before a restart.
+                index.evict_to(self.max_bytes_per_camera)
+        return index
+
+    def store(self, camera: str, timestamp: float, jpeg: bytes, plate_positive: bool = True) -> str:
+        """Archive a frame and return its path relative to the archive root."""
+        if not plate_positive:
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is not None:
+                jpeg = encode_frame(frame, quality=CONTEXT_QUALITY, max_width=CONTEXT_MAX_WIDTH)
+        # Never merge a plate read into a merely similar-looking frame.
+        key = content_key(jpeg) if plate_positive else perceptual_key(jpeg)
+        with self._lock:
+            index = self._index(camera)
+            path = index.file_path(timestamp, key)
+            if (_day(timestamp), key) in index.refs:
+                self.deduplicated += 1
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = path + ".tmp"
+                with open(tmp, "wb") as fh:
+                    fh.write(jpeg)
+                os.replace(tmp, path)
+                self.stored += 1
+            index.append(timestamp, key, len(jpeg))
+            if self.max_bytes_per_camera:
+                self.evicted += index.evict_to(self.max_bytes_per_camera)
+            return os.path.relpath(path, self.root)
+
+    def find(self, camera: str, timestamp: float, tolerance: float = 1.0) -> Optional[str]:
+        """Path of the archived frame nearest to `timestamp`, within `tolerance` seconds."""
+        with self._lock:
+            index = self._index(camera)
+            pos = bisect.bisect_left(index.times, timestamp)
+            best = None
+            for candidate in (pos - 1, pos):
+                if 0 <= candidate < len(index.times):
+                    delta = abs(index.times[candidate] - timestamp)
+                    if delta <= tolerance and (best is None or delta < best[0]):
+                        best = (delta, candidate)
+            if best is None:
+                return None
+            candidate = best[1]
+            path = index.file_path(index.times[candidate], index.keys[candidate])
+            return os.path.relpath(path, self.root)
+
+    def range(self, camera: str, start: float, end: float) -> List[Tuple[float, str]]:
+        """`(timestamp, path)` of every frame archived in ``[start, end)``."""
+        with self._lock:
+            index = self._index(camera)
+            lo = bisect.bisect_left(index.times, start)
+            hi = bisect.bisect_left(index.times, end)
+            return [
+                (index.times[i], os.path.relpath(index.file_path(index.times[i], index.keys[i]), self.root))
+                for i in range(lo, hi)
+            ]
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "stored": self.stored,
+                "deduplicated": self.deduplicated,
+                "evicted": self.evicted,
+                "cameras": {
+                    camera: {"frames": len(index.times), "bytes": index.total_bytes}
+                    for camera, index in self._cameras.items()
+                },
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for index in self._cameras.values():
+                index.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up archived LPR frames.")
+    parser.add_argument("root", help="archive root (LPR_SAVE_FOLDER)")
+    parser.add_argument("camera")
+    parser.add_argument("timestamp", type=float, help="unix timestamp of the event")
+    parser.add_argument("--tolerance", type=float, default=1.0)
+    args = parser.parse_args()
+    path = FrameArchive(args.root).find(args.camera, args.timestamp, args.tolerance)
+    print(os.path.join(args.root, path) if path else "No frame archived near that time.")
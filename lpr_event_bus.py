@@ -0,0 +1,131 @@
+"""In-process fan-out of newly inserted LPR events.
+
+Live dashboards used to re-query the newest events every few seconds, so
+backend load grew with every open dashboard.  `EventBus` turns this around:
+one background thread per process tails the event table by primary key
+(``id > last_id``, an index range scan) and keeps the most recent events in
+a ring buffer; any number of waiting clients are woken from that buffer
+without touching the database.
+
+Inserts made by this process call `notify()` so a poll runs at once; events
+written by other processes (other gunicorn workers, the bulk endpoint on
+another host) are picked up on the next poll.
+
+Ids are assigned at insert but become visible at commit, so a row can appear
+after rows with higher ids; tailing past it would skip it for good.
+`fetch_fn` must therefore stop at the first event that may still have an
+uncommitted predecessor (main.py holds back events younger than
+``LPR_LIVE_COMMIT_LAG``), and the bus only advances over what it returned.
+
+A client whose cursor has fallen out of the buffer gets ``None`` from
+`wait` and should backfill from the database.
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+
+class EventBus:
+    """Ring buffer of recent events with blocking waits on an id cursor.
+
+    :param fetch_fn: ``fetch_fn(after_id, limit)`` returns serialized events
+        (dicts with an ``id``) newer than `after_id`, oldest first.
+    :param head_fn: returns the newest event id, or 0 for an empty table.
+    """
+
+    def __init__(
+        self,
+        fetch_fn: Callable[[int, int], List[Dict]],
+        head_fn: Callable[[], int],
+        buffer_size: int = 1000,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self.fetch_fn = fetch_fn
+        self.head_fn = head_fn
+        self.poll_interval = poll_interval
+        self._events: Deque[Dict] = deque(maxlen=buffer_size)
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_id = 0
+        # Newest id no longer (or never) in the buffer; older cursors must backfill.
+        self._floor = 0
+        self.polls = 0
+        self.waiters = 0
+
+    def start(self) -> None:
+        self.last_id = self._floor = self.head_fn()
+        self._thread = threading.Thread(target=self._run, name="lpr-event-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def notify(self) -> None:
+        """Poll now instead of at the next interval (after a local insert)."""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                self._poll()
+            except Exception as exc:
+                print(f"[event-bus] poll failed: {exc}")
+
+    def _poll(self) -> None:
+        limit = self._events.maxlen
+        while True:
+            events = self.fetch_fn(self.last_id, limit)
+            self.polls += 1
+            if not events:
+                return
+            with self._cond:
+                overflow = len(self._events) + len(events) - limit
+                if overflow > 0:
+                    evicted = list(self._events)[:overflow] + events[:max(0, overflow - len(self._events))]
+                    self._floor = evicted[-1]["id"]
+                self._events.extend(events)
+                self.last_id = events[-1]["id"]
+                self._cond.notify_all()
+            if len(events) < limit:
+                return
+
+    def _after(self, since_id: int, limit: int) -> Optional[List[Dict]]:
+        if since_id < self._floor:
+            return None
+        return [event for event in self._events if event["id"] > since_id][:limit]
+
+    def wait(self, since_id: int, timeout: float, limit: int = 1000) -> Optional[List[Dict]]:
+        """Events newer than `since_id`, blocking up to `timeout` seconds.
+
+        Returns an empty list on timeout and None if `since_id` is older
+        than the buffer.
+        """
+        with self._cond:
+            events = self._after(since_id, limit)
+            if events is None or events or timeout <= 0:
+                return events
+            self.waiters += 1
+            try:
+                self._cond.wait_for(lambda: self.last_id > since_id or self._stop.is_set(), timeout)
+            finally:
+                self.waiters -= 1
+            return self._after(since_id, limit)
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "last_id": self.last_id,
+                "buffered": len(self._events),
+                "waiters": self.waiters,
+                "polls": self.polls,
+            }
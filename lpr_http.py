@@ -0,0 +1,217 @@
+"""Pooled, timeout-bounded HTTP client with a circuit breaker.
+
+`ServiceClient` wraps one keep-alive `requests.Session` per remote service so
+repeated calls reuse TCP/TLS connections.  Every call:
+
+* has a connect and a read timeout, so a hung provider cannot block a worker;
+* must acquire a slot from a concurrency limiter; if none frees up within
+  `acquire_timeout` the call is shed with `ServiceUnavailable`;
+* goes through a circuit breaker that opens after `failure_threshold`
+  consecutive failures (timeouts, connection errors, 5xx and 429 responses)
+  and rejects calls immediately until `reset_timeout` has passed, after which
+  a single trial call decides whether to close it again;
+* records its latency in a histogram keyed by outcome.
+"""
+
+import bisect
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Upper bounds (milliseconds) of the latency histogram buckets.
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class ServiceUnavailable(requests.RequestException):
+    """Raised without contacting the service (circuit open or load shed)."""
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram per outcome."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, List[int]] = {}
+        self._totals: Dict[str, float] = {}
+
+    def observe(self, outcome: str, seconds: float) -> None:
+        index = bisect.bisect_left(self.buckets, seconds * 1000)
+        with self._lock:
+            counts = self._counts.setdefault(outcome, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._totals[outcome] = self._totals.get(outcome, 0.0) + seconds
+
+    def _quantile(self, counts: List[int], q: float) -> Optional[float]:
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return float(self.buckets[index]) if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def snapshot(self) -> Dict[str, Dict[str, object]]:
+        """Counts, mean and bucket-upper-bound p50/p95/p99 (ms) per outcome."""
+        with self._lock:
+            report = {}
+            for outcome, counts in self._counts.items():
+                total = sum(counts)
+                report[outcome] = {
+                    "count": total,
+                    "mean_ms": round(self._totals[outcome] * 1000 / total, 1),
+                    "p50_ms": self._quantile(counts, 0.50),
+                    "p95_ms": self._quantile(counts, 0.95),
+                    "p99_ms": self._quantile(counts, 0.99),
+                    "buckets": dict(zip([str(b) for b in self.buckets] + ["inf"], counts)),
+                }
+            return report
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open)."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.opened_count = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow(self) -> bool:
+        """Return True if a call may proceed now."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened_count += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+
+class ServiceClient:
+    """Shared keep-alive session with timeouts, limiter and circuit breaker."""
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = 10,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 5.0,
+        max_concurrency: int = 8,
+        acquire_timeout: float = 0.5,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        connect_retries: int = 1,
+    ) -> None:
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.acquire_timeout = acquire_timeout
+        self.session = requests.Session()
+        # Only connection failures are retried: a request that reached the
+        # provider may already have been billed.
+        retry = Retry(total=connect_retries, connect=connect_retries, read=0, status=0, backoff_factor=0.2)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.latency = LatencyHistogram()
+        self._counter_lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+
+    def _count(self, outcome: str) -> None:
+        with self._counter_lock:
+            self.counters[outcome] = self.counters.get(outcome, 0) + 1
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise ServiceUnavailable(f"{self.name}: circuit open")
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            self._count("shed")
+            # The breaker granted this call; release a half-open trial slot.
+            if self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.record_failure()
+            raise ServiceUnavailable(f"{self.name}: too many concurrent requests")
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code >= 500 or response.status_code == 429:
+                outcome = "server_error"
+                self.breaker.record_failure()
+            else:
+                outcome = "ok" if response.status_code < 400 else "client_error"
+                self.breaker.record_success()
+            return response
+        except requests.Timeout:
+            outcome = "timeout"
+            self.breaker.record_failure()
+            raise
+        except Exception:
+            outcome = "error"
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._slots.release()
+            self.latency.observe(outcome, time.perf_counter() - started)
+            self._count(outcome)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def stats(self) -> Dict[str, object]:
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened_count,
+            "outcomes": counters,
+            "latency": self.latency.snapshot(),
+        }
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,304 @@
+"""Staged, multi-threaded pipeline primitives for the LPR stream processor.
+
+A pipeline is a chain of stages connected by bounded queues.  Each stage runs
+on its own worker thread(s), so a slow stage (typically plate recognition)
+only fills its own inbox instead of stalling the camera read loop.  When an
+inbox is full the *oldest* queued item is discarded: for a live camera the
+newest frame is always the most useful one.
+
+Every queue and stage keeps simple counters so the processor can report
+per-stage queue depth and throughput.
+"""
+
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+class DropOldestQueue:
+    """Bounded FIFO queue that evicts the oldest item instead of blocking.
+
+    `put` never blocks the producer; when the queue is at `maxsize` the item at
+    the head is dropped and counted in `dropped`.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._items: Deque[Any] = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item: Any) -> bool:
+        """Append `item`; return False if an older item had to be dropped."""
+        with self._cond:
+            evicted = False
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+                evicted = True
+            self._items.append(item)
+            self.put_count += 1
+            self._cond.notify()
+            return not evicted
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        """Remove and return the oldest item; raise `queue.Empty` on timeout."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                raise queue.Empty
+            if not self._items:
+                raise queue.Empty
+            return self._items.popleft()
+
+    def get_batch(self, max_items: int, timeout: Optional[float] = None) -> List[Any]:
+        """Wait for at least one item and return up to `max_items` of them."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self._closed, timeout):
+                return []
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popleft())
+            return batch
+
+    def qsize(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def close(self) -> None:
+        """Wake up every waiting consumer; queued items can still be drained."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Thread-safe counters for a single pipeline stage."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.emitted = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._window_start = time.monotonic()
+        self._window_processed = 0
+
+    def record(self, seconds: float, emitted: int, count: int = 1) -> None:
+        with self._lock:
+            self.processed += count
+            self._window_processed += count
+            self.busy_seconds += seconds
+            self.emitted += int(emitted)
+
+    def record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+
+    def throughput(self) -> float:
+        """Items per second since the previous call (resets the window)."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = max(now - self._window_start, 1e-6)
+            rate = self._window_processed / elapsed
+            self._window_start = now
+            self._window_processed = 0
+            return rate
+
+
+class Stage:
+    """A pool of worker threads applying `fn` to items taken from `inbox`.
+
+    `fn` returns the item to forward to `outbox`, a list of items, or None to
+    drop it (e.g. a frame without a plate).  Exceptions raised by `fn` are
+    counted and printed but never kill the worker.
+
+    With `batch_size` > 1 each call of `fn` receives a list of up to
+    `batch_size` queued items and must return a list of results.
+
+    `tick`, if given, is called by every worker after each item and whenever
+    the inbox is idle; it returns a (possibly empty) list of items to forward.
+    Stateful stages use it to emit results on a timer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        inbox: DropOldestQueue,
+        outbox: Optional[DropOldestQueue] = None,
+        workers: int = 1,
+        tick: Optional[Callable[[], List[Any]]] = None,
+        batch_size: int = 1,
+    ) -> None:
+        self.name = name
+        self.fn = fn
+        self.tick = tick
+        self.batch_size = max(1, batch_size)
+        self.inbox = inbox
+        self.outbox = outbox
+        self.workers = max(1, workers)
+        self.stats = StageStats()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f"lpr-{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        self.inbox.close()
+        for t in self._threads:
+            t.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.batch_size > 1:
+                batch = self.inbox.get_batch(self.batch_size, timeout=0.5)
+                if batch:
+                    self._process(batch, count=len(batch))
+            else:
+                try:
+                    item = self.inbox.get(timeout=0.5)
+                except queue.Empty:
+                    pass
+                else:
+                    self._process(item)
+            if self.tick is not None:
+                self._tick()
+
+    def _tick(self) -> None:
+        try:
+            results = self.tick()
+        except Exception as exc:
+            self.stats.record_error()
+            print(f"[{self.name}] tick error: {exc}")
+            return
+        for result in results:
+            self._emit(result)
+
+    def _emit(self, result: Any) -> None:
+        if self.outbox is not None:
+            self.outbox.put(result)
+
+    def _process(self, item: Any, count: int = 1) -> None:
+        started = time.monotonic()
+        try:
+            result = self.fn(item)
+        except Exception as exc:  # keep the worker alive on bad frames
+            self.stats.record_error()
+            print(f"[{self.name}] error: {exc}")
+            return
+        results = result if isinstance(result, list) else [] if result is None else [result]
+        self.stats.record(time.monotonic() - started, len(results), count)
+        for r in results:
+            self._emit(r)
+
+
+class Source:
+    """A single thread that pulls items from `read_fn` into `outbox`.
+
+    `read_fn` returns the next item, None to skip, or raises `StopIteration`
+    to end the stream.  The source runs as fast as `read_fn` allows and never
+    waits on downstream stages.
+    """
+
+    def __init__(self, name: str, read_fn: Callable[[], Any], outbox: DropOldestQueue) -> None:
+        self.name = name
+        self.read_fn = read_fn
+        self.outbox = outbox
+        self.stats = StageStats()
+        self.finished = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name=f"lpr-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                started = time.monotonic()
+                try:
+                    item = self.read_fn()
+                except StopIteration:
+                    break
+                self.stats.record(time.monotonic() - started, item is not None)
+                if item is not None:
+                    self.outbox.put(item)
+        finally:
+            self.finished.set()
+
+
+class Pipeline:
+    """An ordered collection of sources and stages started and stopped together."""
+
+    def __init__(self) -> None:
+        self.sources: List[Source] = []
+        self.stages: List[Stage] = []
+
+    def add_source(self, source: Source) -> Source:
+        self.sources.append(source)
+        return source
+
+    def add_stage(self, stage: Stage) -> Stage:
+        self.stages.append(stage)
+        return stage
+
+    def start(self) -> None:
+        # Start consumers before producers so nothing is dropped at startup.
+        for stage in reversed(self.stages):
+            stage.start()
+        for source in self.sources:
+            source.start()
+
+    def stop(self) -> None:
+        for source in self.sources:
+            source.stop()
+        for stage in self.stages:
+            stage.stop()
+
+    def finished(self) -> bool:
+        return bool(self.sources) and all(s.finished.is_set() for s in self.sources)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Return per-stage queue depth, drop count and throughput."""
+        report: Dict[str, Dict[str, float]] = {}
+        for source in self.sources:
+            report[source.name] = {
+                "fps": round(source.stats.throughput(), 2),
+                "emitted": source.stats.emitted,
+                "errors": source.stats.errors,
+            }
+        for stage in self.stages:
+            busy = stage.stats.busy_seconds / stage.stats.processed if stage.stats.processed else 0.0
+            report[stage.name] = {
+                "queue_depth": stage.inbox.qsize(),
+                "queue_dropped": stage.inbox.dropped,
+                "fps": round(stage.stats.throughput(), 2),
+                "processed": stage.stats.processed,
+                "errors": stage.stats.errors,
+                "avg_ms": round(busy * 1000, 1),
+            }
+        return report
+
+    def format_snapshot(self) -> str:
+        parts = []
+        for name, stats in self.snapshot().items():
+            fields = " ".join(f"{k}={v}" for k, v in stats.items())
+            parts.append(f"{name}[{fields}]")
+        return " ".join(parts)
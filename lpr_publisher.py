@@ -0,0 +1,233 @@
+"""Batching publisher for LPR events.
+
+Instead of one HTTP request (and one backend transaction) per detected plate,
+events are buffered and sent to ``POST /api/lpr_events/bulk`` in batches.  A
+batch is flushed as soon as it reaches `batch_size` events or the oldest
+buffered event has waited `max_delay` seconds, whichever comes first.
+
+With a spool (`lpr_spool.EventSpool`) configured, batches the backend could
+not accept are written to disk instead of being lost.  While the spool holds
+events, new batches are appended behind them so the backend still receives
+events in order; the spool is replayed oldest first at no more than
+`replay_rate` events per second, backing off exponentially while the backend
+stays unreachable.  Events still buffered at shutdown are spooled as well.
+
+A replayed batch the backend answers with a server error (500, 501...) is
+split in half on each failure, so a single event it cannot store is
+isolated instead of holding back the whole spool.  Only failures of a batch
+of one count as attempts; once that event has failed `max_attempts` times
+it is moved to the spool's dead-letter file.  Network errors, 408/429 and
+the "backend is down" statuses 502/503/504 (the backend also answers 503
+while its database is unreachable) only back off and never count.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import requests
+
+from lpr_http import ServiceClient
+from lpr_spool import EventSpool
+
+# Backoff between replay attempts while the backend is unreachable.
+REPLAY_MIN_BACKOFF = 1.0
+REPLAY_MAX_BACKOFF = 60.0
+# Server errors a single spooled event may cause before it is dead-lettered.
+REPLAY_MAX_ATTEMPTS = 5
+# Statuses meaning the backend (or a proxy in front of it) is unavailable, not that the batch is bad.
+UNAVAILABLE_STATUSES = (408, 429, 502, 503, 504)
+
+
+class BatchingPublisher:
+    """Buffers event dicts and posts them in batches from a background thread.
+
+    :param max_pending: upper bound on buffered events; when exceeded the
+        oldest events are dropped and counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        client: Optional[ServiceClient] = None,
+        batch_size: int = 50,
+        max_delay: float = 1.0,
+        max_pending: int = 10000,
+        spool: Optional[EventSpool] = None,
+        replay_rate: float = 20.0,
+        max_attempts: int = REPLAY_MAX_ATTEMPTS,
+    ) -> None:
+        self.url = url
+        self.client = client or ServiceClient("backend", pool_size=2, max_concurrency=2)
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self._pending: Deque[Dict] = deque()
+        self._max_pending = max_pending
+        self._oldest: Optional[float] = None
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.max_attempts = max(1, max_attempts)
+        self._replay_size = self.batch_size
+        self._next_replay = 0.0
+        self._backoff = REPLAY_MIN_BACKOFF
+        self.sent = 0
+        self.replayed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.batches = 0
+
+    def publish(self, event: Dict) -> None:
+        """Queue one event; never blocks on the network."""
+        with self._cond:
+            if len(self._pending) >= self._max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(event)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="lpr-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Stop the background thread after a final flush."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _take_batch(self) -> List[Dict]:
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            batch.append(self._pending.popleft())
+        self._oldest = time.monotonic() if self._pending else None
+        return batch
+
+    def _due(self) -> bool:
+        if len(self._pending) >= self.batch_size:
+            return True
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.max_delay
+
+    def _replay_due(self) -> bool:
+        return self.spool is not None and len(self.spool) > 0 and time.monotonic() >= self._next_replay
+
+    def _wait_time(self) -> float:
+        wait = self.max_delay
+        if self._oldest is not None:
+            wait = max(0.0, self.max_delay - (time.monotonic() - self._oldest))
+        if self.spool is not None and len(self.spool) > 0:
+            wait = min(wait, max(0.0, self._next_replay - time.monotonic()))
+        return wait
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._stop.is_set() and not self._due() and not self._replay_due():
+                    self._cond.wait(self._wait_time())
+                stopping = self._stop.is_set()
+                if stopping and not self._pending:
+                    return
+                batch = self._take_batch() if (stopping or self._due()) else []
+            if batch:
+                self._deliver(batch, stopping)
+            if not stopping and self._replay_due():
+                self._replay()
+
+    def _deliver(self, batch: List[Dict], stopping: bool = False) -> None:
+        if self.spool is not None and len(self.spool) > 0:
+            # Keep ordering: the backlog on disk must reach the backend first.
+            self.spool.append(batch)
+            return
+        if self._send(batch) in ("retry", "error") and self.spool is not None:
+            self.spool.append(batch)
+            if not stopping:
+                self._schedule_replay(success=False)
+
+    def _replay(self) -> None:
+        rows = self.spool.peek(self._replay_size)
+        if not rows:
+            return
+        outcome = self._send([event for _, event in rows])
+        if outcome == "retry":
+            self._schedule_replay(success=False)
+            return
+        if outcome == "error":
+            if len(rows) > 1:
+                # Narrow down to the event(s) the backend keeps failing on.
+                self._replay_size = max(1, len(rows) // 2)
+            else:
+                row_id, event = rows[0]
+                attempts = self.spool.fail(row_id)
+                if attempts >= self.max_attempts:
+                    self.spool.dead_letter(row_id, f"server error on {attempts} attempts")
+                    print(f"Dead-lettered spooled event {event} after {attempts} failed attempts")
+                    # Keep the backoff: the next event may fail for the same reason.
+                    self._next_replay = time.monotonic() + self._backoff
+                    return
+            self._schedule_replay(success=False)
+            return
+        self._replay_size = self.batch_size
+        self.spool.ack(rows[-1][0])
+        self.replayed += len(rows)
+        self._schedule_replay(success=True, sent=len(rows))
+
+    def _schedule_replay(self, success: bool, sent: int = 0) -> None:
+        now = time.monotonic()
+        if success:
+            self._backoff = REPLAY_MIN_BACKOFF
+            self._next_replay = now + sent / self.replay_rate
+        else:
+            self._next_replay = now + self._backoff
+            self._backoff = min(self._backoff * 2, REPLAY_MAX_BACKOFF)
+
+    def _send(self, batch: List[Dict]) -> str:
+        """POST one batch.
+
+        Returns "ok", "retry" (backend unreachable, unavailable or busy),
+        "error" (other server error, possibly caused by the batch itself) or
+        "drop" (permanent client error).
+        """
+        self.batches += 1
+        try:
+            resp = self.client.post(self.url, json=batch)
+        except requests.RequestException as exc:
+            self.failed += len(batch)
+            print(f"Error posting {len(batch)} event(s) to backend: {exc}")
+            return "retry"
+        if resp.status_code != 200:
+            self.failed += len(batch)
+            print(f"Backend responded with status {resp.status_code}: {resp.text}")
+            if resp.status_code in UNAVAILABLE_STATUSES:
+                return "retry"
+            if 400 <= resp.status_code < 500:
+                self.dropped += len(batch)
+                return "drop"
+            return "error" if resp.status_code >= 500 else "retry"
+        rejected = resp.json().get("rejected") or []
+        for entry in rejected:
+            print(f"Backend rejected event {batch[entry['index']]}: {entry['error']}")
+        self.sent += len(batch) - len(rejected)
+        return "ok"
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "spooled": len(self.spool) if self.spool is not None else 0,
+            "spool_dropped": self.spool.dropped if self.spool is not None else 0,
+            "dead_lettered": self.spool.dead_lettered if self.spool is not None else 0,
+            "replayed": self.replayed,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "batches": self.batches,
+        }
@@ -0,0 +1,183 @@
+"""Adaptive per-camera frame sampling for LPR.
+
+`AdaptiveSampler` decides which candidate frames (after the motion gate or
+`LPR_FRAME_SKIP`) are sent for recognition.  Every camera has a minimum
+interval between recognized frames that is tuned at runtime:
+
+* while the recognizer is slower than `target_latency` or its queue holds
+  `queue_high` or more frames, every interval is multiplied by `backoff`
+  (sample less, so the backlog drains and latency stays within the SLO);
+* once latency and queue depth are back under control the interval shrinks
+  by `recover` per adjustment, down to `min_interval`;
+* with a per-hour API budget, a token bucket refilled at
+  ``budget_per_hour / 3600`` calls per second caps the total, and intervals
+  never go below the even share of the budget across active cameras.
+
+Latency is tracked per camera as an exponentially weighted moving average of
+`observe()` calls; queue depth comes from `depth_fn`.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# A camera counts as active if it offered a frame within this many seconds.
+ACTIVE_WINDOW = 30.0
+
+
+class _CameraState:
+    __slots__ = ("interval", "last_admit", "last_seen", "latency", "admitted", "skipped_interval", "skipped_budget")
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.last_admit = 0.0
+        self.last_seen = 0.0
+        self.latency: Optional[float] = None
+        self.admitted = 0
+        self.skipped_interval = 0
+        self.skipped_budget = 0
+
+
+class AdaptiveSampler:
+    """AIMD sampling-interval controller with an hourly call budget.
+
+    :param budget_per_hour: recognizer calls allowed per hour across all
+        cameras; 0 disables the budget.
+    :param depth_fn: returns the current recognizer backlog in frames.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 0.2,
+        max_interval: float = 10.0,
+        target_latency: float = 1.0,
+        queue_high: int = 4,
+        budget_per_hour: float = 0.0,
+        backoff: float = 1.5,
+        recover: float = 0.9,
+        adjust_every: float = 1.0,
+        depth_fn: Optional[Callable[[], int]] = None,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.target_latency = target_latency
+        self.queue_high = queue_high
+        self.budget_per_hour = budget_per_hour
+        self.backoff = backoff
+        self.recover = recover
+        self.adjust_every = adjust_every
+        self.depth_fn = depth_fn
+        self._lock = threading.Lock()
+        self._cameras: Dict[str, _CameraState] = {}
+        self._next_adjust = 0.0
+        self._queue_depth = 0
+        # A minute's worth of budget may be spent in a burst.
+        self._bucket_capacity = max(1.0, budget_per_hour / 60.0)
+        self._tokens = self._bucket_capacity
+        self._refilled_at: Optional[float] = None
+        self.decisions: Dict[str, int] = {"slow_down": 0, "speed_up": 0, "budget_cap": 0}
+
+    def _camera(self, camera: str) -> _CameraState:
+        state = self._cameras.get(camera)
+        if state is None:
+            state = self._cameras[camera] = _CameraState(self.min_interval)
+        return state
+
+    def _refill(self, now: float) -> None:
+        if self.budget_per_hour <= 0:
+            return
+        if self._refilled_at is not None and now > self._refilled_at:
+            rate = self.budget_per_hour / 3600.0
+            self._tokens = min(self._bucket_capacity, self._tokens + (now - self._refilled_at) * rate)
+        self._refilled_at = now
+
+    def _budget_floor(self, now: float) -> float:
+        """Smallest interval that keeps active cameras within the budget."""
+        if self.budget_per_hour <= 0:
+            return 0.0
+        active = sum(1 for s in self._cameras.values() if now - s.last_seen <= ACTIVE_WINDOW)
+        return max(active, 1) * 3600.0 / self.budget_per_hour
+
+    def _adjust(self, now: float) -> None:
+        if self.depth_fn is not None:
+            try:
+                self._queue_depth = self.depth_fn()
+            except NotImplementedError:
+                # multiprocessing queues cannot report their size on some platforms.
+                self._queue_depth = 0
+        congested = self._queue_depth >= self.queue_high
+        floor = self._budget_floor(now)
+        for state in self._cameras.values():
+            slow = congested or (state.latency is not None and state.latency > self.target_latency)
+            interval = state.interval * (self.backoff if slow else self.recover)
+            if interval < floor:
+                interval = floor
+                self.decisions["budget_cap"] += 1
+            interval = min(max(interval, self.min_interval), max(self.max_interval, floor))
+            if interval > state.interval:
+                self.decisions["slow_down"] += 1
+            elif interval < state.interval:
+                self.decisions["speed_up"] += 1
+            state.interval = interval
+
+    def admit(self, camera: str, now: Optional[float] = None) -> bool:
+        """Return True if a frame from `camera` should be recognized now."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_adjust:
+                self._adjust(now)
+                self._next_adjust = now + self.adjust_every
+            state = self._camera(camera)
+            state.last_seen = now
+            if now - state.last_admit < state.interval:
+                state.skipped_interval += 1
+                return False
+            if self.budget_per_hour > 0:
+                self._refill(now)
+                if self._tokens < 1.0:
+                    state.skipped_budget += 1
+                    return False
+                self._tokens -= 1.0
+            state.last_admit = now
+            state.admitted += 1
+            return True
+
+    def observe(self, camera: str, seconds: float, alpha: float = 0.2) -> None:
+        """Record the recognition latency of one frame from `camera`."""
+        with self._lock:
+            state = self._camera(camera)
+            if state.latency is None:
+                state.latency = seconds
+            else:
+                state.latency += alpha * (seconds - state.latency)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            self._refill(time.monotonic())
+            return {
+                "queue_depth": self._queue_depth,
+                "budget_per_hour": self.budget_per_hour,
+                "budget_tokens": round(self._tokens, 1) if self.budget_per_hour > 0 else None,
+                "decisions": dict(self.decisions),
+                "cameras": {
+                    camera: {
+                        "rate_fps": round(1.0 / state.interval, 3) if state.interval else None,
+                        "interval_s": round(state.interval, 3),
+                        "latency_ms": round(state.latency * 1000, 1) if state.latency is not None else None,
+                        "admitted": state.admitted,
+                        "skipped_interval": state.skipped_interval,
+                        "skipped_budget": state.skipped_budget,
+                    }
+                    for camera, state in self._cameras.items()
+                },
+            }
+
+    def format_snapshot(self) -> str:
+        snap = self.snapshot()
+        cameras = " ".join(
+            f"{camera}:{c['rate_fps']}fps,lat={c['latency_ms']}ms,ok={c['admitted']},"
+            f"skip={c['skipped_interval']}/{c['skipped_budget']}"
+            for camera, c in snap["cameras"].items()
+        )
+        budget = f" tokens={snap['budget_tokens']}" if snap["budget_tokens"] is not None else ""
+        return f"depth={snap['queue_depth']}{budget} decisions={snap['decisions']} {cameras}"
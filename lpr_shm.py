@@ -0,0 +1,130 @@
+"""Shared-memory frame ring buffer for the multi-process LPR mode.
+
+Capture processes write decoded frames into fixed-size slots of one
+`multiprocessing.shared_memory` block; recognition processes read them back
+as zero-copy NumPy views.  Only small ``(slot, camera, seq, timestamp,
+shape)`` tuples travel through the queues, never the pixel data.
+
+Slot ownership is passed around with two queues:
+
+* ``free`` holds indices of unused slots;
+* ``ready`` holds messages for written slots, oldest first.
+
+A writer takes a free slot; if there is none it steals the oldest ready
+message and reuses that slot (drop-oldest, as in `lpr_pipeline`).  A reader
+owns a slot from the moment it takes the message until it calls `release`.
+"""
+
+import queue
+from multiprocessing import resource_tracker, shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+Shape = Tuple[int, int, int]
+
+
+class FrameRing:
+    """`slots` frame buffers of at most `max_shape` (height, width, channels)."""
+
+    def __init__(
+        self,
+        slots: int,
+        max_shape: Shape,
+        free_q,
+        ready_q,
+        name: Optional[str] = None,
+        create: bool = True,
+    ) -> None:
+        self.slots = slots
+        self.max_shape = tuple(max_shape)
+        self.slot_bytes = int(np.prod(self.max_shape))
+        self.free_q = free_q
+        self.ready_q = ready_q
+        self.created = create
+        if create:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * slots)
+            for slot in range(slots):
+                free_q.put(slot)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Attaching registers the block with the resource tracker, which
+            # would unlink it when this process exits; only the creator owns it.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self._buffer = np.ndarray((slots, self.slot_bytes), dtype=np.uint8, buffer=self.shm.buf)
+        self.dropped = 0
+
+    def spec(self) -> dict:
+        """Picklable arguments for `FrameRing.attach` in another process."""
+        return {
+            "name": self.shm.name,
+            "slots": self.slots,
+            "max_shape": self.max_shape,
+            "free_q": self.free_q,
+            "ready_q": self.ready_q,
+        }
+
+    @classmethod
+    def attach(cls, spec: dict) -> "FrameRing":
+        return cls(spec["slots"], spec["max_shape"], spec["free_q"], spec["ready_q"], name=spec["name"], create=False)
+
+    def _fit(self, frame: np.ndarray) -> np.ndarray:
+        max_h, max_w, _ = self.max_shape
+        height, width = frame.shape[:2]
+        if height <= max_h and width <= max_w:
+            return frame
+        scale = min(max_h / float(height), max_w / float(width))
+        return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def _acquire_slot(self) -> Optional[int]:
+        try:
+            return self.free_q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            slot = self.ready_q.get_nowait()[0]
+        except queue.Empty:
+            return None
+        self.dropped += 1
+        return slot
+
+    def write(self, frame: np.ndarray, camera: str, seq: int, timestamp: float) -> bool:
+        """Copy `frame` into a slot and announce it; False if no slot was free."""
+        slot = self._acquire_slot()
+        if slot is None:
+            self.dropped += 1
+            return False
+        frame = np.ascontiguousarray(self._fit(frame), dtype=np.uint8)
+        shape = frame.shape if frame.ndim == 3 else frame.shape + (1,)
+        self._buffer[slot, :frame.size] = frame.reshape(-1)
+        self.ready_q.put((slot, camera, seq, timestamp, shape))
+        return True
+
+    def view(self, slot: int, shape: Shape) -> np.ndarray:
+        """Zero-copy view of a slot; valid until the slot is released."""
+        size = int(np.prod(shape))
+        view = self._buffer[slot, :size].reshape(shape)
+        return view[:, :, 0] if shape[2] == 1 else view
+
+    def release(self, slot: int) -> None:
+        self.free_q.put(slot)
+
+    def close(self) -> None:
+        del self._buffer
+        self.shm.close()
+        if self.created:
+            self.shm.unlink()
+
+
+class RingWriter:
+    """Adapter giving a `FrameRing` the `put(item)` interface of a pipeline queue.
+
+    Lets `lpr_supervisor.CameraWorker` run unchanged inside a capture process.
+    """
+
+    def __init__(self, ring: FrameRing) -> None:
+        self.ring = ring
+
+    def put(self, item) -> bool:
+        return self.ring.write(item.frame, item.camera, item.seq, item.timestamp)
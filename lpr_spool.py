@@ -0,0 +1,122 @@
+"""Durable on-disk spool for LPR events the backend could not accept.
+
+Events are appended to a small SQLite database (WAL mode, one row per event,
+ordered by an autoincrement id) and read back oldest first.  The spool never
+grows beyond `max_events`: when it is full the oldest events are discarded and
+counted in `dropped`.
+
+Each event also counts the replay attempts the backend failed with a server
+error.  Events that keep failing are moved by `dead_letter` to a JSON-lines
+file next to the spool (``<path>.dead.jsonl``) so they stop blocking the
+events queued behind them.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Tuple
+
+
+class EventSpool:
+    """Append-only FIFO of JSON events stored in SQLite."""
+
+    def __init__(self, path: str, max_events: int = 100000) -> None:
+        self.path = path
+        self.max_events = max_events
+        self.dead_letter_path = path + ".dead.jsonl"
+        self.dropped = 0
+        self.dead_lettered = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " payload TEXT NOT NULL,"
+            " spooled_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(spool)")}
+        if "attempts" not in columns:
+            # Spools written before attempts were tracked.
+            self._conn.execute("ALTER TABLE spool ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._count = self._conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def append(self, events: Iterable[Dict]) -> int:
+        """Append events in order; returns how many were written."""
+        now = time.time()
+        rows = [(json.dumps(e, default=str), now) for e in events]
+        if not rows:
+            return 0
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany("INSERT INTO spool (payload, spooled_at) VALUES (?, ?)", rows)
+                self._count += len(rows)
+                overflow = self._count - self.max_events
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM spool WHERE id IN (SELECT id FROM spool ORDER BY id LIMIT ?)",
+                        (overflow,),
+                    )
+                    self._count -= overflow
+                    self.dropped += overflow
+        return len(rows)
+
+    def peek(self, limit: int) -> List[Tuple[int, Dict]]:
+        """Return up to `limit` of the oldest events as `(id, event)` pairs."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload FROM spool ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+    def fail(self, row_id: int) -> int:
+        """Count a failed attempt for event `row_id`; returns its attempts so far."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.execute("UPDATE spool SET attempts = attempts + 1 WHERE id = ?", (row_id,))
+                row = self._conn.execute("SELECT attempts FROM spool WHERE id = ?", (row_id,)).fetchone()
+        return row[0] if row else 0
+
+    def dead_letter(self, row_id: int, reason: str) -> int:
+        """Move event `row_id` to the dead-letter file; returns how many events moved."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, spooled_at, attempts FROM spool WHERE id = ?", (row_id,)
+            ).fetchall()
+            if not rows:
+                return 0
+            with open(self.dead_letter_path, "a", encoding="utf-8") as fh:
+                for _, payload, spooled_at, attempts in rows:
+                    fh.write(json.dumps({
+                        "event": json.loads(payload),
+                        "spooled_at": spooled_at,
+                        "attempts": attempts,
+                        "reason": reason,
+                        "dead_lettered_at": time.time(),
+                    }) + "\n")
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                deleted = self._conn.execute("DELETE FROM spool WHERE id = ?", (row_id,)).rowcount
+                self._count -= deleted
+            self.dead_lettered += deleted
+        return deleted
+
+    def ack(self, last_id: int) -> None:
+        """Remove every event up to and including `last_id`."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN IMMEDIATE")
+                deleted = self._conn.execute("DELETE FROM spool WHERE id <= ?", (last_id,)).rowcount
+                self._count -= deleted
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -1,76 +1,478 @@
 """Video stream processor for licence plate recognition.
 
-This script connects to an RTSP camera, periodically saves frames, sends them
-to an external LPR service for recognition, and posts any detected plate to
-the Instagate backend at `/lpr-event`.  The recognition logic is kept in
+This script connects to an RTSP camera, periodically encodes frames in memory,
+sends them to an external LPR service for recognition, and posts any detected
+plate to the Instagate backend.  The recognition logic is kept in
 `lpr_recognizer.py` to separate I/O from the core algorithm.
+
+Work is split into a staged pipeline (see `lpr_pipeline.py`):
+
+    capture -> [motion gate] -> encode -> recognize -> track -> [archive] -> publish
+
+Each stage runs on its own thread(s) behind a bounded drop-oldest queue, so
+the capture loop keeps reading at camera FPS no matter how slow recognition
+or the backend is.  Per-stage queue depth and throughput are printed every
+`LPR_STATS_INTERVAL` seconds.
+
+Frames are JPEG-encoded in memory; archiving plate-positive frames is an
+optional stage (`LPR_ARCHIVE_FRAMES=1`), so the hot path performs no disk
+I/O.  The archive (`lpr_archive.FrameArchive` under `SAVE_FOLDER`) is
+content-addressed, bucketed by day, indexed by timestamp and capped at
+`LPR_ARCHIVE_MAX_MB` per camera; archived plate frames keep full quality.
+At most one recognized frame without a plate per camera and
+`LPR_ARCHIVE_CONTEXT_INTERVAL` seconds is archived as context, small and at
+low quality, and deduplicated by look so a static scene is stored once.
+
+With the motion gate enabled (the default) every captured frame goes through a
+cheap change detector (`lpr_motion.py`) and only frames in which something
+moves inside `LPR_MOTION_ROI` are sent for recognition.  `LPR_FRAME_SKIP`
+sampling is used only when the gate is disabled.
+
+The track stage (`lpr_tracker.py`) groups repeated reads of the same vehicle,
+votes per character across them and publishes one consolidated event per
+passage, with a per-camera, per-plate cooldown.
+
+Events are sent to `LPR_BACKEND_URL` (``/api/lpr_events/bulk``) in batches by
+`lpr_publisher.BatchingPublisher`, flushed by size or age.  Batches the
+backend cannot take are kept in an on-disk spool (`LPR_SPOOL_PATH`) and
+replayed in order at a bounded rate once it recovers.  Events the backend
+keeps failing on with a server error are moved to ``<spool>.dead.jsonl``
+after `LPR_SPOOL_MAX_ATTEMPTS` attempts instead of blocking the spool.
+
+Before encoding, `lpr_sampler.AdaptiveSampler` decides per camera which
+frames are worth a recognizer call: it samples less while recognition is
+slower than `LPR_LATENCY_SLO` or backing up, recovers when it catches up, and
+keeps the total under `LPR_API_BUDGET_PER_HOUR`.  Its rates and decisions are
+printed with the other statistics.
+
+Recognition uses the backend selected by `LPR_RECOGNIZER_BACKEND` (see
+`lpr_recognizer.py`); the recognize stage hands it up to `LPR_BATCH_SIZE`
+queued frames at a time.
+
+With `LPR_PROCESSES` set above 0 the camera is handed to
+`lpr_supervisor.MultiProcessSupervisor` instead: capture and recognition run
+in separate processes and exchange frames through a shared-memory ring
+(`lpr_shm.py`), leaving only tracking and publishing in this process.
 """
 
 import os
+import threading
 import time
+from typing import Any, Callable, Dict, List, Optional
+
 import cv2
-import requests
 
-from lpr_recognizer import recognize_plate
+from lpr_archive import FrameArchive
+from lpr_motion import ChangeDetector, MotionGate, parse_roi
+from lpr_pipeline import DropOldestQueue, Pipeline, Source, Stage
+from lpr_publisher import BatchingPublisher
+from lpr_spool import EventSpool
+from lpr_recognizer import RecognizerBackend, encode_frame, get_backend
+from lpr_sampler import AdaptiveSampler
+from lpr_tracker import PlateTracker
 
 # === CONFIGURATION ===
 # Replace with your camera's RTSP stream URI; use 0 for a local webcam.
 RTSP_URL = os.environ.get("LPR_RTSP_URL", "0")
+# Camera name reported to the backend with every event.
+CAMERA_ID = os.environ.get("LPR_CAMERA_ID", "default")
 # API key for OpenALPR (or similar service); set as env var for security.
 API_KEY = os.environ.get("OPENALPR_API_KEY", "")
 # Directory to store captured frames
 SAVE_FOLDER = os.environ.get("LPR_SAVE_FOLDER", "captured_frames")
-# Process every Nth frame to reduce API usage
+# Archive plate-positive frames to SAVE_FOLDER (off the recognition hot path).
+ARCHIVE_FRAMES = os.environ.get("LPR_ARCHIVE_FRAMES", "0").lower() in {"1", "true", "yes"}
+# Archive disk budget per camera (oldest frames are evicted beyond it) and
+# the JPEG quality of archived frames.
+ARCHIVE_MAX_MB = float(os.environ.get("LPR_ARCHIVE_MAX_MB", "2048"))
+ARCHIVE_QUALITY = int(os.environ.get("LPR_ARCHIVE_QUALITY", "95"))
+# Seconds between context frames (recognized, no plate) archived per camera; 0 disables.
+ARCHIVE_CONTEXT_INTERVAL = float(os.environ.get("LPR_ARCHIVE_CONTEXT_INTERVAL", "10"))
+# Process every Nth frame to reduce API usage (only without the motion gate)
 FRAME_SKIP = int(os.environ.get("LPR_FRAME_SKIP", "30"))
+# Motion gate: only recognize while something moves inside the ROI.
+MOTION_GATE = os.environ.get("LPR_MOTION_GATE", "1").lower() in {"1", "true", "yes"}
+# Region of interest as "x,y,w,h" frame fractions; empty means the whole frame.
+MOTION_ROI = parse_roi(os.environ.get("LPR_MOTION_ROI", ""))
+# Fraction of ROI pixels that must change to trigger recognition.
+MOTION_MIN_CHANGED = float(os.environ.get("LPR_MOTION_MIN_CHANGED", "0.02"))
+# Minimum seconds between recognitions while motion persists.
+MOTION_INTERVAL = float(os.environ.get("LPR_MOTION_INTERVAL", "0.5"))
+# Backend bulk endpoint that receives detected plates.
+BACKEND_URL = os.environ.get("LPR_BACKEND_URL", "http://127.0.0.1:5000/api/lpr_events/bulk")
+# Events per bulk request and the longest an event waits before a flush.
+PUBLISH_BATCH_SIZE = int(os.environ.get("LPR_PUBLISH_BATCH_SIZE", "50"))
+PUBLISH_MAX_DELAY = float(os.environ.get("LPR_PUBLISH_MAX_DELAY", "1.0"))
+# SQLite spool for events the backend could not accept; empty disables it.
+SPOOL_PATH = os.environ.get("LPR_SPOOL_PATH", "lpr_spool.sqlite3")
+# Spool size cap (oldest events are discarded beyond it) and replay rate.
+SPOOL_MAX_EVENTS = int(os.environ.get("LPR_SPOOL_MAX_EVENTS", "100000"))
+SPOOL_REPLAY_RATE = float(os.environ.get("LPR_SPOOL_REPLAY_RATE", "20"))
+# Server errors a spooled event may cause before it is dead-lettered.
+SPOOL_MAX_ATTEMPTS = int(os.environ.get("LPR_SPOOL_MAX_ATTEMPTS", "5"))
+# Adaptive sampling of candidate frames; the interval between recognized
+# frames per camera stays within [MIN, MAX] seconds.
+ADAPTIVE_SAMPLING = os.environ.get("LPR_ADAPTIVE_SAMPLING", "1").lower() in {"1", "true", "yes"}
+SAMPLE_MIN_INTERVAL = float(os.environ.get("LPR_SAMPLE_MIN_INTERVAL", "0.2"))
+SAMPLE_MAX_INTERVAL = float(os.environ.get("LPR_SAMPLE_MAX_INTERVAL", "10"))
+# Recognition latency target (seconds) the sampler backs off to hold.
+LATENCY_SLO = float(os.environ.get("LPR_LATENCY_SLO", "1.0"))
+# Recognizer calls allowed per hour across all cameras; 0 means unlimited.
+API_BUDGET_PER_HOUR = float(os.environ.get("LPR_API_BUDGET_PER_HOUR", "0"))
+# Tracker: seconds of silence that close a passage, per-plate cooldown and
+# the age at which an idling vehicle is reported anyway.
+TRACK_WINDOW = float(os.environ.get("LPR_TRACK_WINDOW", "2.0"))
+TRACK_COOLDOWN = float(os.environ.get("LPR_TRACK_COOLDOWN", "60"))
+TRACK_MAX_AGE = float(os.environ.get("LPR_TRACK_MAX_AGE", "10"))
+# Pipeline sizing: bounded queue length per stage and recognition workers.
+QUEUE_SIZE = int(os.environ.get("LPR_QUEUE_SIZE", "8"))
+RECOGNIZE_WORKERS = int(os.environ.get("LPR_RECOGNIZE_WORKERS", "2"))
+# Maximum frames handed to the recognizer backend in one call.
+BATCH_SIZE = int(os.environ.get("LPR_BATCH_SIZE", "4"))
+# Seconds between pipeline statistics reports; 0 disables them.
+STATS_INTERVAL = float(os.environ.get("LPR_STATS_INTERVAL", "10"))
+# Show a preview window (press "q" to quit); disable on headless gate boxes.
+SHOW_PREVIEW = os.environ.get("LPR_SHOW_PREVIEW", "1").lower() in {"1", "true", "yes"}
+# Recognition processes; above 0 capture and recognition run in separate
+# processes sharing frames through shared memory (see `lpr_supervisor.py`).
+PROCESSES = int(os.environ.get("LPR_PROCESSES", "0"))
+
+class FrameItem:
+    """A sampled frame travelling through the pipeline."""
+
+    __slots__ = ("camera", "seq", "timestamp", "frame", "jpeg", "image_path", "plate", "confidence", "read_count")
+
+    def __init__(self, camera: str, seq: int, timestamp: float, frame: Any) -> None:
+        self.camera = camera
+        self.seq = seq
+        self.timestamp = timestamp
+        self.frame = frame
+        self.jpeg: Optional[bytes] = None
+        self.image_path: Optional[str] = None
+        self.plate: Optional[str] = None
+        self.confidence: Optional[float] = None
+        self.read_count = 1
+
+
+class CaptureReader:
+    """Reads frames from `cap` and emits every `frame_skip`-th one."""
+
+    def __init__(self, cap: "cv2.VideoCapture", camera: str, frame_skip: int) -> None:
+        self.cap = cap
+        self.camera = camera
+        self.frame_skip = max(1, frame_skip)
+        self.frame_count = 0
+        self.latest_frame = None
+
+    def __call__(self) -> Optional[FrameItem]:
+        ret, frame = self.cap.read()
+        if not ret:
+            print("Failed to read frame.")
+            raise StopIteration
+        self.latest_frame = frame
+        seq = self.frame_count
+        self.frame_count += 1
+        if seq % self.frame_skip:
+            return None
+        return FrameItem(self.camera, seq, time.time(), frame)
+
+
+_backend: Optional[RecognizerBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_recognizer() -> RecognizerBackend:
+    """Return the process-wide recognizer backend, creating it on first use."""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = get_backend(secret_key=API_KEY)
+        return _backend
+
+
+_publisher: Optional[BatchingPublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> BatchingPublisher:
+    """Return the process-wide event publisher, starting it on first use."""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            spool = EventSpool(SPOOL_PATH, max_events=SPOOL_MAX_EVENTS) if SPOOL_PATH else None
+            _publisher = BatchingPublisher(
+                BACKEND_URL,
+                batch_size=PUBLISH_BATCH_SIZE,
+                max_delay=PUBLISH_MAX_DELAY,
+                spool=spool,
+                replay_rate=SPOOL_REPLAY_RATE,
+                max_attempts=SPOOL_MAX_ATTEMPTS,
+            )
+            _publisher.start()
+        return _publisher
+
+
+def shutdown() -> None:
+    """Flush buffered events; call once the pipeline has stopped."""
+    with _publisher_lock:
+        publisher = _publisher
+    with _archive_lock:
+        if _archive is not None:
+            _archive.close()
+    if publisher is not None:
+        publisher.stop()
+        if publisher.spool is not None:
+            publisher.spool.close()
+
+
+_sampler: Optional[AdaptiveSampler] = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler() -> Optional[AdaptiveSampler]:
+    """Return the process-wide adaptive sampler, or None when disabled."""
+    global _sampler
+    if not ADAPTIVE_SAMPLING:
+        return None
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = make_sampler()
+        return _sampler
+
+
+def make_sampler(budget_share: float = 1.0, depth_fn: Optional[Callable[[], int]] = None) -> AdaptiveSampler:
+    """Build a sampler from the configuration with `budget_share` of the budget."""
+    return AdaptiveSampler(
+        min_interval=SAMPLE_MIN_INTERVAL,
+        max_interval=SAMPLE_MAX_INTERVAL,
+        target_latency=LATENCY_SLO,
+        queue_high=QUEUE_SIZE // 2 or 1,
+        budget_per_hour=API_BUDGET_PER_HOUR * budget_share,
+        depth_fn=depth_fn,
+    )
+
+
+_archive: Optional[FrameArchive] = None
+_archive_lock = threading.Lock()
 
-# Ensure the save folder exists
-os.makedirs(SAVE_FOLDER, exist_ok=True)
+
+def get_archive() -> FrameArchive:
+    """Return the process-wide frame archive, opening it on first use."""
+    global _archive
+    with _archive_lock:
+        if _archive is None:
+            _archive = FrameArchive(SAVE_FOLDER, max_bytes_per_camera=int(ARCHIVE_MAX_MB * 1024 * 1024))
+        return _archive
+
+
+def archive_jpeg(frame) -> bytes:
+    """Full-resolution JPEG of a frame for the archive."""
+    return encode_frame(frame, quality=ARCHIVE_QUALITY, max_width=0)
+
+
+def format_recognizer_stats() -> str:
+    """One-line summary of the recognizer's HTTP outcomes and latency."""
+    stats = get_recognizer().stats()
+    if not stats:
+        return ""
+    latency = " ".join(
+        f"{outcome}:p50={h['p50_ms']}ms,p95={h['p95_ms']}ms" for outcome, h in stats["latency"].items()
+    )
+    return f"breaker={stats['breaker']} outcomes={stats['outcomes']} {latency}"
+
+
+def encode_item(item: FrameItem) -> Optional[FrameItem]:
+    """JPEG-encode the frame in memory, unless the backend takes raw frames.
+
+    Frames the adaptive sampler turns down are dropped here, before any work.
+    """
+    sampler = get_sampler()
+    if sampler is not None and not sampler.admit(item.camera):
+        return None
+    if get_recognizer().wants_jpeg:
+        item.jpeg = encode_frame(item.frame)
+        if not ARCHIVE_FRAMES:
+            item.frame = None
+    return item
+
+
+_context_q: Optional[DropOldestQueue] = None
+_context_last: Dict[str, float] = {}
+_context_lock = threading.Lock()
+
+
+def _context_due(camera: str, timestamp: float) -> bool:
+    with _context_lock:
+        if timestamp - _context_last.get(camera, float("-inf")) < ARCHIVE_CONTEXT_INTERVAL:
+            return False
+        _context_last[camera] = timestamp
+        return True
+
+
+def archive_context(item: FrameItem) -> None:
+    """Store a frame without a plate as a small, look-deduplicated context frame."""
+    jpeg = item.jpeg if item.jpeg is not None else encode_frame(item.frame)
+    get_archive().store(item.camera, item.timestamp, jpeg, plate_positive=False)
+
+
+def recognize_frames(items: List[FrameItem]) -> List[FrameItem]:
+    """Recognize a batch of frames; drop frames without a plate."""
+    backend = get_recognizer()
+    images = [item.jpeg if item.jpeg is not None else item.frame for item in items]
+    started = time.monotonic()
+    results = backend.recognize_batch(images)
+    elapsed = time.monotonic() - started
+    sampler = get_sampler()
+    detected = []
+    for item, (plate, conf) in zip(items, results):
+        if sampler is not None:
+            sampler.observe(item.camera, elapsed)
+        if not plate:
+            print("[x] No plate detected.")
+            if _context_q is not None and _context_due(item.camera, item.timestamp):
+                _context_q.put(item)
+            continue
+        print(f"[✓] Plate: {plate} | Confidence: {conf:.1f}%")
+        item.plate = plate
+        item.confidence = conf
+        detected.append(item)
+    return detected
+
+
+def archive_frame(item: FrameItem) -> FrameItem:
+    """Store a plate-positive frame at full quality in the archive."""
+    jpeg = archive_jpeg(item.frame) if item.frame is not None else item.jpeg
+    if jpeg is not None:
+        path = get_archive().store(item.camera, item.timestamp, jpeg, plate_positive=True)
+        item.image_path = os.path.join(SAVE_FOLDER, path)
+    item.frame = None
+    return item
+
+
+def publish_event(item: FrameItem) -> None:
+    """Queue a detected plate for the next batch sent to the backend."""
+    get_publisher().publish({
+        "plate": item.plate,
+        "confidence": item.confidence,
+        "timestamp": item.timestamp,
+        "camera": item.camera,
+        "image_url": item.image_path,
+    })
+
+
+def add_publish_stages(
+    pipeline: Pipeline,
+    on_published: Optional[Callable[[FrameItem], None]] = None,
+) -> DropOldestQueue:
+    """Add track -> [archive] -> publish to `pipeline`; returns the track queue.
+
+    `on_published` is called after each publish.
+    """
+    track_q = DropOldestQueue(QUEUE_SIZE * 4)
+    publish_q = DropOldestQueue(QUEUE_SIZE * 4)
+    tracker = PlateTracker(window=TRACK_WINDOW, cooldown=TRACK_COOLDOWN, max_age=TRACK_MAX_AGE)
+
+    def publish(item: FrameItem) -> None:
+        publish_event(item)
+        if on_published is not None:
+            on_published(item)
+
+    if ARCHIVE_FRAMES:
+        archive_q = DropOldestQueue(QUEUE_SIZE * 4)
+        pipeline.add_stage(Stage("track", tracker.add, track_q, archive_q, tick=tracker.tick))
+        pipeline.add_stage(Stage("archive", archive_frame, archive_q, publish_q))
+    else:
+        pipeline.add_stage(Stage("track", tracker.add, track_q, publish_q, tick=tracker.tick))
+    pipeline.add_stage(Stage("publish", publish, publish_q))
+    return track_q
+
+
+def add_recognition_stages(
+    pipeline: Pipeline,
+    on_published: Optional[Callable[[FrameItem], None]] = None,
+) -> DropOldestQueue:
+    """Add encode -> recognize -> track -> [archive] -> publish to `pipeline`.
+
+    Returns the entry queue that sampled frames should be put on.  The stages
+    are camera-agnostic, so one set can serve many cameras (see
+    `lpr_supervisor.py`).  `on_published` is called after each publish.
+    """
+    global _context_q
+    encode_q = DropOldestQueue(QUEUE_SIZE)
+    recognize_q = DropOldestQueue(QUEUE_SIZE)
+    sampler = get_sampler()
+    if sampler is not None:
+        sampler.depth_fn = recognize_q.qsize
+    pipeline.add_stage(Stage("encode", encode_item, encode_q, recognize_q))
+    track_q = add_publish_stages(pipeline, on_published)
+    pipeline.add_stage(
+        Stage("recognize", recognize_frames, recognize_q, track_q, workers=RECOGNIZE_WORKERS, batch_size=BATCH_SIZE)
+    )
+    if ARCHIVE_FRAMES and ARCHIVE_CONTEXT_INTERVAL > 0:
+        _context_q = DropOldestQueue(QUEUE_SIZE)
+        pipeline.add_stage(Stage("context", archive_context, _context_q))
+    return encode_q
+
+
+def build_pipeline(reader: CaptureReader) -> Pipeline:
+    """Wire a single camera into the capture -> ... -> publish pipeline."""
+    pipeline = Pipeline()
+    if MOTION_GATE:
+        gate_q = DropOldestQueue(2)
+        detector = ChangeDetector(roi=MOTION_ROI, min_changed=MOTION_MIN_CHANGED)
+        pipeline.add_source(Source("capture", reader, gate_q))
+        encode_q = add_recognition_stages(pipeline)
+        pipeline.add_stage(Stage("motion", MotionGate(detector, MOTION_INTERVAL), gate_q, encode_q))
+    else:
+        encode_q = add_recognition_stages(pipeline)
+        pipeline.add_source(Source("capture", reader, encode_q))
+    return pipeline
 
 
 def main() -> None:
     """Connect to the camera and process frames indefinitely."""
+    if PROCESSES > 0:
+        from lpr_supervisor import CameraConfig, serve
+
+        serve([CameraConfig(CAMERA_ID, RTSP_URL)], PROCESSES)
+        return
+
     cap = cv2.VideoCapture(RTSP_URL)
     if not cap.isOpened():
         print(f"Failed to connect to camera at {RTSP_URL}.")
         return
 
-    frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            print("Failed to read frame.")
-            break
-
-        if frame_count % FRAME_SKIP == 0:
-            timestamp = int(time.time())
-            image_path = os.path.join(SAVE_FOLDER, f"frame_{timestamp}.jpg")
-            cv2.imwrite(image_path, frame)
-
-            # Recognize plate using external API
-            plate, conf = recognize_plate(image_path, API_KEY)
-            if plate:
-                print(f"[✓] Plate: {plate} | Confidence: {conf:.1f}%")
-                # send detected plate to backend
-                try:
-                    resp = requests.post(
-                        "http://127.0.0.1:5000/lpr-event",
-                        json={"plate": plate, "confidence": conf, "timestamp": timestamp},
-                        timeout=3,
-                    )
-                    if resp.status_code != 200:
-                        print(f"Backend responded with status {resp.status_code}: {resp.text}")
-                except requests.RequestException as exc:
-                    print(f"Error posting to backend: {exc}")
-            else:
-                print("[x] No plate detected.")
+    reader = CaptureReader(cap, CAMERA_ID, 1 if MOTION_GATE else FRAME_SKIP)
+    pipeline = build_pipeline(reader)
+    pipeline.start()
 
-        frame_count += 1
-        cv2.imshow("LPR Camera", frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    next_report = time.monotonic() + STATS_INTERVAL
+    try:
+        while not pipeline.finished():
+            if SHOW_PREVIEW:
+                frame = reader.latest_frame
+                if frame is not None:
+                    cv2.imshow("LPR Camera", frame)
+                if cv2.waitKey(30) & 0xFF == ord("q"):
+                    break
+            else:
+                time.sleep(0.1)
+            if STATS_INTERVAL and time.monotonic() >= next_report:
+                print(f"[pipeline] {pipeline.format_snapshot()}")
+                recognizer_stats = format_recognizer_stats()
+                if recognizer_stats:
+                    print(f"[recognizer] {recognizer_stats}")
+                if get_sampler() is not None:
+                    print(f"[sampler] {get_sampler().format_snapshot()}")
+                print(f"[publisher] {get_publisher().stats()}")
+                next_report = time.monotonic() + STATS_INTERVAL
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        shutdown()
+        cap.release()
+        cv2.destroyAllWindows()
 
 
 if __name__ == "__main__":
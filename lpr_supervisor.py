@@ -0,0 +1,477 @@
+"""Multi-camera supervisor for licence plate recognition.
+
+`lpr_stream_processor.py` handles a single camera.  The supervisor runs many
+cameras in one process: every camera gets one lightweight capture thread
+(frame read + motion gate on a downscaled image), and all cameras feed one
+shared, size-limited set of encode/recognize/track/publish stages.  Adding a
+camera therefore adds a thread and a `VideoCapture`, not another recognition
+pool, HTTP connection pool or OpenCV process.
+
+Cameras come from a JSON file::
+
+    [{"id": "north-gate", "url": "rtsp://...", "roi": "0.2,0.5,0.6,0.5"}, ...]
+
+or from a database table with ``name``, ``url`` and optional ``roi`` columns
+(``--db-table``, using ``DATABASE_URL``).  A camera that fails to open or
+stops delivering frames is reconnected with exponential backoff.
+
+With ``--processes N`` the supervisor switches to multi-process mode so
+decoding, resizing and change detection are not limited by the GIL: every
+camera is captured in its own process, N recognition processes run the
+recognizer, and frames move between them through a shared-memory ring buffer
+(`lpr_shm.FrameRing`) with only slot indices on the queues.  Reads come back
+to this process for tracking and publishing.
+
+Usage::
+
+    python lpr_supervisor.py --cameras cameras.json
+    python lpr_supervisor.py --db-table lpr_cameras
+    python lpr_supervisor.py --cameras cameras.json --processes 4
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import cv2
+
+import lpr_stream_processor as processor
+from lpr_motion import ChangeDetector, MotionGate, parse_roi
+from lpr_pipeline import DropOldestQueue, Pipeline, Source
+from lpr_recognizer import encode_frame
+from lpr_shm import FrameRing, RingWriter
+
+# Reconnect backoff: first delay and upper bound, in seconds.
+RECONNECT_MIN_DELAY = float(os.environ.get("LPR_RECONNECT_MIN_DELAY", "1"))
+RECONNECT_MAX_DELAY = float(os.environ.get("LPR_RECONNECT_MAX_DELAY", "60"))
+# Multi-process mode: frame slots in the shared ring and the largest frame
+# (height,width,channels) a slot holds; bigger frames are downscaled to fit.
+RING_SLOTS = int(os.environ.get("LPR_RING_SLOTS", "32"))
+RING_MAX_SHAPE = tuple(int(v) for v in os.environ.get("LPR_RING_MAX_SHAPE", "1080,1920,3").split(","))
+
+
+class CameraConfig:
+    def __init__(self, camera_id: str, url: str, roi: Optional[str] = None) -> None:
+        self.camera_id = camera_id
+        self.url = url
+        self.roi = parse_roi(roi)
+
+
+def load_cameras_file(path: str) -> List[CameraConfig]:
+    with open(path, encoding="utf-8") as fh:
+        entries = json.load(fh)
+    return [CameraConfig(str(e["id"]), str(e["url"]), e.get("roi")) for e in entries]
+
+
+def load_cameras_table(table: str, database_url: Optional[str] = None) -> List[CameraConfig]:
+    """Load cameras from a table with ``name``, ``url`` and ``roi`` columns."""
+    from sqlalchemy import MetaData, Table, create_engine, select
+
+    engine = create_engine(database_url or os.environ["DATABASE_URL"])
+    cameras = Table(table, MetaData(), autoload_with=engine)
+    roi_col = cameras.c.roi if "roi" in cameras.c else None
+    columns = [cameras.c.name, cameras.c.url] + ([roi_col] if roi_col is not None else [])
+    with engine.connect() as conn:
+        rows = conn.execute(select(*columns)).all()
+    engine.dispose()
+    return [CameraConfig(str(r[0]), str(r[1]), r[2] if len(r) > 2 else None) for r in rows]
+
+
+def _open_source(url: str):
+    # Numeric URLs are local device indexes, as in lpr_stream_processor.
+    return int(url) if url.isdigit() else url
+
+
+class CameraStats:
+    """Per-camera counters: capture FPS, triggers, reconnects, errors, latency."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.triggered = 0
+        self.events = 0
+        self.reconnects = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.connected = False
+        self._latencies: Deque[float] = deque(maxlen=256)
+        self._window_start = time.monotonic()
+        self._window_frames = 0
+
+    def frame(self, triggered: bool) -> None:
+        with self._lock:
+            self.frames += 1
+            self._window_frames += 1
+            if triggered:
+                self.triggered += 1
+
+    def error(self, message: str) -> None:
+        with self._lock:
+            self.errors += 1
+            self.last_error = message
+
+    def published(self, latency: float) -> None:
+        with self._lock:
+            self.events += 1
+            self._latencies.append(latency)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            now = time.monotonic()
+            fps = self._window_frames / max(now - self._window_start, 1e-6)
+            self._window_start, self._window_frames = now, 0
+            latencies = sorted(self._latencies)
+            p50 = latencies[len(latencies) // 2] if latencies else 0.0
+            return {
+                "connected": self.connected,
+                "fps": round(fps, 2),
+                "triggered": self.triggered,
+                "events": self.events,
+                "latency_p50_ms": round(p50 * 1000, 1),
+                "reconnects": self.reconnects,
+                "errors": self.errors,
+            }
+
+
+class CameraWorker:
+    """One capture thread per camera, with motion gate and reconnect backoff."""
+
+    def __init__(self, config: CameraConfig, outbox: DropOldestQueue) -> None:
+        self.config = config
+        self.outbox = outbox
+        self.stats = CameraStats()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._seq = 0
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._run, name=f"lpr-camera-{self.config.camera_id}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _make_gate(self) -> Optional[MotionGate]:
+        if not processor.MOTION_GATE:
+            return None
+        roi = self.config.roi or processor.MOTION_ROI
+        detector = ChangeDetector(roi=roi, min_changed=processor.MOTION_MIN_CHANGED)
+        return MotionGate(detector, processor.MOTION_INTERVAL)
+
+    def _run(self) -> None:
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop.is_set():
+            cap = cv2.VideoCapture(_open_source(self.config.url))
+            if cap.isOpened():
+                self.stats.connected = True
+                if self._capture(cap):
+                    delay = RECONNECT_MIN_DELAY
+            else:
+                self.stats.error(f"failed to connect to {self.config.url}")
+            cap.release()
+            self.stats.connected = False
+            if self._stop.is_set():
+                break
+            self.stats.reconnects += 1
+            wait = delay * random.uniform(0.8, 1.2)
+            print(f"[{self.config.camera_id}] reconnecting in {wait:.1f}s")
+            self._stop.wait(wait)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _capture(self, cap) -> bool:
+        """Read until the stream fails; return True if any frame was read."""
+        gate = self._make_gate()
+        frame_skip = max(1, processor.FRAME_SKIP)
+        got_frames = False
+        while not self._stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                self.stats.error("failed to read frame")
+                return got_frames
+            got_frames = True
+            seq = self._seq
+            self._seq += 1
+            item = processor.FrameItem(self.config.camera_id, seq, time.time(), frame)
+            if gate is not None:
+                item = gate(item)
+            elif seq % frame_skip:
+                item = None
+            self.stats.frame(item is not None)
+            if item is not None:
+                self.outbox.put(item)
+        return got_frames
+
+
+class Supervisor:
+    """Runs one `CameraWorker` per camera over a shared recognition pipeline."""
+
+    def __init__(self, cameras: List[CameraConfig]) -> None:
+        self.pipeline = Pipeline()
+        entry_q = processor.add_recognition_stages(self.pipeline, on_published=self._on_published)
+        self.workers: Dict[str, CameraWorker] = {
+            c.camera_id: CameraWorker(c, entry_q) for c in cameras
+        }
+
+    def _on_published(self, item) -> None:
+        worker = self.workers.get(item.camera)
+        if worker is not None:
+            worker.stats.published(time.time() - item.timestamp)
+
+    def start(self) -> None:
+        self.pipeline.start()
+        for worker in self.workers.values():
+            worker.start()
+
+    def stop(self) -> None:
+        for worker in self.workers.values():
+            worker.stop()
+        self.pipeline.stop()
+        processor.shutdown()
+
+    def report(self) -> str:
+        lines = [f"[pipeline] {self.pipeline.format_snapshot()}"]
+        recognizer_stats = processor.format_recognizer_stats()
+        if recognizer_stats:
+            lines.append(f"[recognizer] {recognizer_stats}")
+        sampler = processor.get_sampler()
+        if sampler is not None:
+            lines.append(f"[sampler] {sampler.format_snapshot()}")
+        lines.append(f"[publisher] {processor.get_publisher().stats()}")
+        for camera_id, worker in self.workers.items():
+            fields = " ".join(f"{k}={v}" for k, v in worker.stats.snapshot().items())
+            lines.append(f"[camera {camera_id}] {fields}")
+        return "\n".join(lines)
+
+
+def _capture_process(config: CameraConfig, ring_spec: dict, result_q, stop_event) -> None:
+    """Capture process: a `CameraWorker` writing gated frames into the ring."""
+    ring = FrameRing.attach(ring_spec)
+    worker = CameraWorker(config, RingWriter(ring))
+    worker.start()
+    try:
+        while not stop_event.wait(processor.STATS_INTERVAL or 10):
+            snapshot = worker.stats.snapshot()
+            snapshot["ring_dropped"] = ring.dropped
+            result_q.put(("camera", config.camera_id, snapshot))
+    finally:
+        worker.stop()
+        ring.close()
+
+
+def _recognition_process(index: int, processes: int, ring_spec: dict, result_q, stop_event) -> None:
+    """Recognition process: reads ring slots as NumPy views and recognizes them.
+
+    Each process runs its own adaptive sampler with an equal share of the
+    API budget.
+    """
+    ring = FrameRing.attach(ring_spec)
+    backend = processor.get_recognizer()
+    sampler = None
+    if processor.ADAPTIVE_SAMPLING:
+        sampler = processor.make_sampler(1.0 / processes, depth_fn=ring.ready_q.qsize)
+    next_report = time.monotonic() + (processor.STATS_INTERVAL or 10)
+    try:
+        while not stop_event.is_set():
+            if time.monotonic() >= next_report:
+                stats = processor.format_recognizer_stats()
+                if sampler is not None:
+                    stats = f"{stats} sampler: {sampler.format_snapshot()}".strip()
+                result_q.put(("recognizer", index, stats))
+                next_report = time.monotonic() + (processor.STATS_INTERVAL or 10)
+            try:
+                messages = [ring.ready_q.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            while len(messages) < processor.BATCH_SIZE:
+                try:
+                    messages.append(ring.ready_q.get_nowait())
+                except queue.Empty:
+                    break
+            if sampler is not None:
+                admitted = []
+                for message in messages:
+                    if sampler.admit(message[1]):
+                        admitted.append(message)
+                    else:
+                        ring.release(message[0])
+                messages = admitted
+            if messages:
+                _recognize_slots(ring, backend, messages, result_q, sampler)
+    finally:
+        ring.close()
+
+
+def _recognize_slots(ring: FrameRing, backend, messages, result_q, sampler=None) -> None:
+    views = [ring.view(slot, shape) for slot, _, _, _, shape in messages]
+    try:
+        frames = list(zip(messages, views))
+        if backend.wants_jpeg:
+            images, frames = [], []
+            for message, view in zip(messages, views):
+                try:
+                    images.append(encode_frame(view))
+                except Exception as exc:
+                    # One corrupt frame must not take down the recognition process.
+                    print(f"[recognize] could not encode frame {message[2]} from {message[1]}: {exc}")
+                    continue
+                frames.append((message, view))
+            if not processor.ARCHIVE_FRAMES:
+                for slot, *_ in messages:
+                    ring.release(slot)
+                views = None
+            if not images:
+                return
+        else:
+            images = views
+        started = time.monotonic()
+        try:
+            results = backend.recognize_batch(images)
+        except Exception as exc:
+            print(f"[recognize] error: {exc}")
+            return
+        if sampler is not None:
+            for message, _ in frames:
+                sampler.observe(message[1], time.monotonic() - started)
+        for ((slot, camera, seq, timestamp, _), view), (plate, conf) in zip(frames, results):
+            if not plate:
+                continue
+            jpeg = None
+            if processor.ARCHIVE_FRAMES:
+                jpeg = processor.archive_jpeg(view)
+            result_q.put(("read", camera, seq, timestamp, plate, conf, jpeg))
+    finally:
+        if views is not None:
+            for slot, *_ in messages:
+                ring.release(slot)
+
+
+class MultiProcessSupervisor:
+    """Capture and recognition in separate processes joined by a `FrameRing`.
+
+    This process only tracks and publishes the reads the recognition
+    processes send back.
+    """
+
+    def __init__(self, cameras: List[CameraConfig], processes: int) -> None:
+        ctx = multiprocessing.get_context("spawn")
+        self.ring = FrameRing(RING_SLOTS, RING_MAX_SHAPE, ctx.Queue(), ctx.Queue())
+        self.result_q = ctx.Queue()
+        self.stop_event = ctx.Event()
+        self.cameras = cameras
+        self.camera_stats: Dict[str, Dict[str, object]] = {}
+        self.recognizer_stats: Dict[int, str] = {}
+        self.published: Dict[str, CameraStats] = {c.camera_id: CameraStats() for c in cameras}
+        spec = self.ring.spec()
+        self.processes = [
+            ctx.Process(target=_capture_process, args=(c, spec, self.result_q, self.stop_event),
+                        name=f"lpr-capture-{c.camera_id}", daemon=True)
+            for c in cameras
+        ] + [
+            ctx.Process(target=_recognition_process, args=(i, processes, spec, self.result_q, self.stop_event),
+                        name=f"lpr-recognize-{i}", daemon=True)
+            for i in range(processes)
+        ]
+        self.pipeline = Pipeline()
+        track_q = processor.add_publish_stages(self.pipeline, on_published=self._on_published)
+        self.pipeline.add_source(Source("results", self._read_result, track_q))
+
+    def _read_result(self):
+        try:
+            message = self.result_q.get(timeout=0.5)
+        except queue.Empty:
+            return None
+        kind = message[0]
+        if kind == "camera":
+            self.camera_stats[message[1]] = message[2]
+            return None
+        if kind == "recognizer":
+            self.recognizer_stats[message[1]] = message[2]
+            return None
+        _, camera, seq, timestamp, plate, conf, jpeg = message
+        item = processor.FrameItem(camera, seq, timestamp, None)
+        item.plate, item.confidence, item.jpeg = plate, conf, jpeg
+        return item
+
+    def _on_published(self, item) -> None:
+        stats = self.published.get(item.camera)
+        if stats is not None:
+            stats.published(time.time() - item.timestamp)
+
+    def start(self) -> None:
+        self.pipeline.start()
+        for process in self.processes:
+            process.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        for process in self.processes:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.pipeline.stop()
+        processor.shutdown()
+        self.ring.close()
+
+    def report(self) -> str:
+        lines = [f"[pipeline] {self.pipeline.format_snapshot()}"]
+        for index, stats in sorted(self.recognizer_stats.items()):
+            if stats:
+                lines.append(f"[recognizer {index}] {stats}")
+        lines.append(f"[publisher] {processor.get_publisher().stats()}")
+        for camera in self.cameras:
+            fields = dict(self.camera_stats.get(camera.camera_id, {}))
+            published = self.published[camera.camera_id].snapshot()
+            fields["events"] = published["events"]
+            fields["latency_p50_ms"] = published["latency_p50_ms"]
+            text = " ".join(f"{k}={v}" for k, v in fields.items())
+            lines.append(f"[camera {camera.camera_id}] {text}")
+        return "\n".join(lines)
+
+
+def serve(cameras: List[CameraConfig], processes: int = 0) -> None:
+    """Run cameras until interrupted, printing stats every `LPR_STATS_INTERVAL`."""
+    supervisor = MultiProcessSupervisor(cameras, processes) if processes else Supervisor(cameras)
+    supervisor.start()
+    mode = f" with {processes} recognition process(es)" if processes else ""
+    print(f"Supervising {len(cameras)} camera(s){mode}.")
+    interval = processor.STATS_INTERVAL or 10
+    try:
+        while True:
+            time.sleep(interval)
+            if processor.STATS_INTERVAL:
+                print(supervisor.report())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        supervisor.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run LPR for many cameras in one process.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--cameras", help="JSON file with a list of {id, url, roi} cameras")
+    source.add_argument("--db-table", help="database table with name/url/roi columns")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="recognition processes; enables multi-process mode with a shared-memory ring")
+    args = parser.parse_args(argv)
+
+    cameras = load_cameras_file(args.cameras) if args.cameras else load_cameras_table(args.db_table)
+    if not cameras:
+        print("No cameras configured.")
+        return
+    serve(cameras, args.processes)
+
+
+if __name__ == "__main__":
+    main()
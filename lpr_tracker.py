@@ -0,0 +1,152 @@
+"""Temporal plate tracking for the LPR stream processor.
+
+A vehicle waiting at the gate is recognised many times, often with OCR
+jitter ("ABC123", "A8C123", "ABC12").  The tracker groups reads from the same
+camera whose plates are within a small edit distance into a *track*, votes
+per character across the reads (weighted by confidence) and emits a single
+consolidated read per passage.  A per-camera, per-plate cooldown suppresses
+repeat events for a car that lingers or passes again shortly after.
+
+Items only need ``camera``, ``plate``, ``confidence`` and ``timestamp``
+attributes; the best-confidence item of a track is emitted with its plate
+replaced by the voted plate and ``read_count`` set to the number of reads.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from plate_search import edit_distance
+
+
+def vote_plate(reads: List[Tuple[str, float]]) -> str:
+    """Confidence-weighted per-character vote over `(plate, confidence)` reads.
+
+    The winning length is voted first; only reads of that length take part in
+    the per-position character vote.
+    """
+    length_scores: Dict[int, float] = defaultdict(float)
+    for plate, conf in reads:
+        length_scores[len(plate)] += conf
+    length = max(length_scores, key=length_scores.get)
+    chars = []
+    for i in range(length):
+        scores: Dict[str, float] = defaultdict(float)
+        for plate, conf in reads:
+            if len(plate) == length:
+                scores[plate[i]] += conf
+        chars.append(max(scores, key=scores.get))
+    return "".join(chars)
+
+
+class Track:
+    """Reads of one vehicle passage on one camera."""
+
+    def __init__(self, item: Any, now: float) -> None:
+        self.camera = item.camera
+        self.reads: List[Tuple[str, float]] = []
+        self.best = item
+        self.first_seen = now
+        self.last_seen = now
+        self.emitted = False
+        self.plate = item.plate
+        self.add(item, now)
+
+    def add(self, item: Any, now: float) -> None:
+        conf = float(item.confidence or 0.0) or 1.0
+        self.reads.append((item.plate, conf))
+        if (item.confidence or 0.0) > (self.best.confidence or 0.0):
+            self.best = item
+        self.last_seen = now
+        self.plate = vote_plate(self.reads)
+
+
+class PlateTracker:
+    """Groups plate reads into tracks and emits one event per passage.
+
+    :param window: seconds without a matching read after which a track closes.
+    :param cooldown: seconds during which the same plate on the same camera is
+        not emitted again after an event.
+    :param max_age: a track still open after this many seconds is emitted
+        early (the vehicle is idling); later reads are absorbed silently.
+    :param max_distance: edit distance within which a read joins a track.
+    """
+
+    def __init__(
+        self,
+        window: float = 2.0,
+        cooldown: float = 60.0,
+        max_age: float = 10.0,
+        max_distance: int = 2,
+    ) -> None:
+        self.window = window
+        self.cooldown = cooldown
+        self.max_age = max_age
+        self.max_distance = max_distance
+        self._tracks: Dict[str, List[Track]] = defaultdict(list)
+        self._last_emitted: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+        self.reads = 0
+        self.events = 0
+        self.suppressed = 0
+
+    def add(self, item: Any, now: Optional[float] = None) -> List[Any]:
+        """Add a recognised read; returns any events that became due."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.reads += 1
+            tracks = self._tracks[item.camera]
+            best_track, best_distance = None, self.max_distance + 1
+            for track in tracks:
+                distance = edit_distance(item.plate, track.plate, self.max_distance)
+                if distance < best_distance:
+                    best_track, best_distance = track, distance
+            if best_track is None:
+                tracks.append(Track(item, now))
+            else:
+                best_track.add(item, now)
+            return self._collect(now)
+
+    def tick(self, now: Optional[float] = None) -> List[Any]:
+        """Close idle tracks and return the events they produce."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._collect(now)
+
+    def _collect(self, now: float) -> List[Any]:
+        events = []
+        for camera, tracks in self._tracks.items():
+            still_open = []
+            for track in tracks:
+                idle = now - track.last_seen >= self.window
+                if not track.emitted and (idle or now - track.first_seen >= self.max_age):
+                    event = self._emit(track, now)
+                    if event is not None:
+                        events.append(event)
+                if not idle:
+                    still_open.append(track)
+            self._tracks[camera] = still_open
+        self._expire_cooldowns(now)
+        return events
+
+    def _emit(self, track: Track, now: float) -> Optional[Any]:
+        track.emitted = True
+        key = (track.camera, track.plate)
+        last = self._last_emitted.get(key)
+        if last is not None and now - last < self.cooldown:
+            self.suppressed += 1
+            return None
+        self._last_emitted[key] = now
+        self.events += 1
+        item = track.best
+        item.plate = track.plate
+        item.read_count = len(track.reads)
+        return item
+
+    def _expire_cooldowns(self, now: float) -> None:
+        if len(self._last_emitted) < 1024:
+            return
+        for key, last in list(self._last_emitted.items()):
+            if now - last >= self.cooldown:
+                del self._last_emitted[key]
@@ -0,0 +1,37 @@
+"""add LPR event keyset indexes
+
+Revision ID: 3f1c2a7d9b10
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_lpr_event_timestamp_id', ['timestamp', 'id']),
+    ('ix_lpr_event_plate_timestamp_id', ['plate', 'timestamp', 'id']),
+    ('ix_lpr_event_camera_timestamp_id', ['camera', 'timestamp', 'id']),
+)
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # Build without locking out ingestion on large tables.
+        with op.get_context().autocommit_block():
+            for name, columns in INDEXES:
+                op.create_index(name, 'lpr_event', columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        for name, columns in INDEXES:
+            op.create_index(name, 'lpr_event', columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='lpr_event')
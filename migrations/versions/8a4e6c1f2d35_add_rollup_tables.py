@@ -0,0 +1,72 @@
+"""add LPR/access rollup tables
+
+Revision ID: 8a4e6c1f2d35
+Revises: 3f1c2a7d9b10
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6c1f2d35'
+down_revision = '3f1c2a7d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'lpr_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('camera', sa.String(length=64), nullable=False),
+        sa.Column('events', sa.Integer(), nullable=True),
+        sa.Column('unique_plates', sa.Integer(), nullable=True),
+        sa.Column('confidence_sum', sa.Float(), nullable=True),
+        sa.Column('confidence_count', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('period', 'bucket_start', 'camera', name='uq_lpr_rollups_bucket'),
+    )
+    op.create_table(
+        'access_rollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('door', sa.String(length=64), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('granted', sa.Integer(), nullable=True),
+        sa.Column('denied', sa.Integer(), nullable=True),
+        sa.Column('unique_users', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('period', 'bucket_start', 'door', name='uq_access_rollups_bucket'),
+    )
+    op.create_table(
+        'rollup_members',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('source', sa.String(length=16), nullable=False),
+        sa.Column('period', sa.String(length=8), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('dimension', sa.String(length=64), nullable=False),
+        sa.Column('member', sa.String(length=120), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('source', 'period', 'bucket_start', 'dimension', 'member', name='uq_rollup_members'),
+    )
+    op.create_index('ix_rollup_members_bucket', 'rollup_members', ['source', 'bucket_start'])
+    op.create_table(
+        'rollup_watermarks',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+    )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_index('ix_rollup_members_bucket', table_name='rollup_members')
+    op.drop_table('rollup_members')
+    op.drop_table('access_rollups')
+    op.drop_table('lpr_rollups')
@@ -0,0 +1,97 @@
+"""add typed, indexed AccessLog timestamp
+
+Revision ID: b2d9e4f7a316
+Revises: 8a4e6c1f2d35
+Create Date: 2026-10-16 15:00:00.000000
+
+Adds ``access_log.timestamp`` next to the ``time`` string and backfills it
+in chunks.  The model declares it as::
+
+    timestamp = db.Column(db.DateTime)
+    __table_args__ = (
+        db.Index("ix_access_log_timestamp_id", "timestamp", "id"),
+        db.Index("ix_access_log_door_timestamp_id", "door", "timestamp", "id"),
+        db.Index("ix_access_log_user_timestamp_id", "user", "timestamp", "id"),
+    )
+
+Rows whose ``time`` cannot be parsed keep a NULL timestamp.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d9e4f7a316'
+down_revision = '8a4e6c1f2d35'
+branch_labels = None
+depends_on = None
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+CHUNK_SIZE = 10000
+
+INDEXES = (
+    ('ix_access_log_timestamp_id', ['timestamp', 'id']),
+    ('ix_access_log_door_timestamp_id', ['door', 'timestamp', 'id']),
+    ('ix_access_log_user_timestamp_id', ['user', 'timestamp', 'id']),
+)
+
+access_log = sa.table(
+    'access_log',
+    sa.column('id', sa.Integer),
+    sa.column('time', sa.String),
+    sa.column('timestamp', sa.DateTime),
+)
+
+
+def _parse(value):
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _backfill(bind):
+    select = (
+        sa.select(access_log.c.id, access_log.c.time)
+        .where(access_log.c.id > sa.bindparam('last_id'), access_log.c.timestamp.is_(None))
+        .order_by(access_log.c.id)
+        .limit(CHUNK_SIZE)
+    )
+    update = (
+        sa.update(access_log)
+        .where(access_log.c.id == sa.bindparam('_id'))
+        .values(timestamp=sa.bindparam('_timestamp'))
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(select, {'last_id': last_id}).all()
+        if not rows:
+            return
+        values = [{'_id': row.id, '_timestamp': _parse(row.time)} for row in rows]
+        values = [value for value in values if value['_timestamp'] is not None]
+        if values:
+            bind.execute(update, values)
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.add_column('access_log', sa.Column('timestamp', sa.DateTime(), nullable=True))
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # Commit each chunk and build the indexes without locking out the gate.
+        with op.get_context().autocommit_block():
+            _backfill(bind)
+            for name, columns in INDEXES:
+                op.create_index(name, 'access_log', columns, postgresql_concurrently=True, if_not_exists=True)
+    else:
+        _backfill(bind)
+        for name, columns in INDEXES:
+            op.create_index(name, 'access_log', columns, if_not_exists=True)
+
+
+def downgrade():
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='access_log')
+    op.drop_column('access_log', 'timestamp')
@@ -0,0 +1,32 @@
+"""add AccessLog repeat counter
+
+Revision ID: c7a1f3e58d24
+Revises: b2d9e4f7a316
+Create Date: 2026-10-16 17:00:00.000000
+
+Repeated gate checks of the same plate at the same door within the burst
+window are counted on the original row instead of inserting new ones.  The
+model declares it as::
+
+    repeat_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a1f3e58d24'
+down_revision = 'b2d9e4f7a316'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'access_log',
+        sa.Column('repeat_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade():
+    op.drop_column('access_log', 'repeat_count')
@@ -0,0 +1,28 @@
+"""add rollup watermark commit-lag snapshot
+
+Revision ID: d4b8e2a6c913
+Revises: c7a1f3e58d24
+Create Date: 2026-10-16 19:00:00.000000
+
+The rollup engine folds rows only up to the highest id it saw at least
+``ROLLUP_COMMIT_LAG`` seconds earlier, recorded as ``seen_id``/``seen_at``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4b8e2a6c913'
+down_revision = 'c7a1f3e58d24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('rollup_watermarks', sa.Column('seen_id', sa.Integer(), nullable=True))
+    op.add_column('rollup_watermarks', sa.Column('seen_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('rollup_watermarks', 'seen_at')
+    op.drop_column('rollup_watermarks', 'seen_id')
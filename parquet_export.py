@@ -0,0 +1,244 @@
+"""Incremental Parquet export of LPR events, access logs and audit events.
+
+Rows are streamed from the database in batches (server-side cursor) and
+written as typed, compressed Parquet files partitioned Hive-style by day and
+organisation::
+
+    <out_dir>/<table>/day=2024-05-01/org=3/part-000000123-000004567.parquet
+
+Each run only exports rows whose id is above the table's watermark, kept in
+``<out_dir>/_watermarks.json``, and appends new part files; existing files
+are never rewritten.  The watermark is advanced after each batch's files are
+in place, so an interrupted run resumes where it stopped.
+
+Ids are handed out before commit, so a lower id can become visible after a
+higher one.  A run therefore notes the highest id of each table, waits
+``EXPORT_COMMIT_LAG`` seconds, and exports up to that id only; a transaction
+still open by then is not waited for.
+
+Column sets change over time; each table's spec carries a
+``schema_version``, recorded next to its watermark and in the metadata of
+every part file.  Files written before a column was added lack it, so read
+the tree with the current schema (``pyarrow.dataset.dataset(path,
+schema=...)``) to get nulls there.  ``access_logs`` versions:
+
+1. id, time, user, door, status
+2. adds ``timestamp``
+3. adds ``repeat_count``
+
+Analysts read the whole tree with ``pyarrow.dataset`` or
+``pandas.read_parquet(out_dir + "/lpr_events")`` and get real timestamps
+instead of formatted strings.
+
+Requires pyarrow (see requirements-ai.txt).  Run with::
+
+    flask export-parquet --out exports/ [--table lpr_events] [--batch-size 100000]
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, select
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "100000"))
+EXPORT_COMPRESSION = os.environ.get("EXPORT_PARQUET_COMPRESSION", "zstd")
+# Organisation partition for tables without an organisation column
+# (single-tenant gate deployments).
+EXPORT_DEFAULT_ORG = os.environ.get("EXPORT_DEFAULT_ORG", "default")
+# Seconds to wait for transactions holding ids below a run's highest id to commit
+EXPORT_COMMIT_LAG = float(os.environ.get("EXPORT_COMMIT_LAG", "30"))
+# Format of AccessLog.time
+ACCESS_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_access_time(value):
+    try:
+        return datetime.strptime(value, ACCESS_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def _lpr_events():
+    from estatecore_backend.models import LPREvent
+    return {
+        "model": LPREvent,
+        "schema_version": 1,
+        "columns": [
+            ("id", pa.int64(), None),
+            ("timestamp", pa.timestamp("us"), None),
+            ("plate", pa.string(), None),
+            ("camera", pa.string(), None),
+            ("confidence", pa.float64(), None),
+            ("image_url", pa.string(), None),
+            ("notes", pa.string(), None),
+            ("created_at", pa.timestamp("us"), None),
+        ],
+        "day": lambda row: row.timestamp or row.created_at,
+        "org": lambda row: EXPORT_DEFAULT_ORG,
+    }
+
+
+def _access_logs():
+    from estatecore_backend.models import AccessLog
+    return {
+        "model": AccessLog,
+        "schema_version": 3,
+        "columns": [
+            ("id", pa.int64(), None),
+            ("timestamp", pa.timestamp("us"), None),
+            # Original string column, exported as a real timestamp.
+            ("time", pa.timestamp("us"), _parse_access_time),
+            ("user", pa.string(), None),
+            ("door", pa.string(), None),
+            ("status", pa.string(), None),
+            # Repeats of the decision counted until the row was exported;
+            # bumps arriving after that are not in the file.
+            ("repeat_count", pa.int32(), None),
+        ],
+        "day": lambda row: row.timestamp or _parse_access_time(row.time),
+        "org": lambda row: EXPORT_DEFAULT_ORG,
+    }
+
+
+def _audit_events():
+    from estatecore_audit.models import AuditEvent
+    return {
+        "model": AuditEvent,
+        "schema_version": 1,
+        "columns": [
+            ("id", pa.int64(), None),
+            ("client_id", pa.int64(), None),
+            ("actor_id", pa.int64(), None),
+            ("entity_type", pa.string(), None),
+            ("entity_id", pa.string(), None),
+            ("action", pa.string(), None),
+            ("meta", pa.string(), lambda v: json.dumps(v, default=str) if v is not None else None),
+            ("created_at", pa.timestamp("us"), None),
+        ],
+        "day": lambda row: row.created_at,
+        "org": lambda row: row.client_id,
+    }
+
+
+TABLES = {
+    "lpr_events": _lpr_events,
+    "access_logs": _access_logs,
+    "audit_events": _audit_events,
+}
+
+
+def _load_watermarks(out_dir):
+    """``{table: {"last_id": ..., "schema_version": ...}}``; older trees stored the id alone."""
+    path = os.path.join(out_dir, "_watermarks.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as fh:
+        watermarks = json.load(fh)
+    return {
+        table: state if isinstance(state, dict) else {"last_id": state}
+        for table, state in watermarks.items()
+    }
+
+
+def _save_watermarks(out_dir, watermarks):
+    path = os.path.join(out_dir, "_watermarks.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as fh:
+        json.dump(watermarks, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _write_partitions(out_dir, table, spec, rows):
+    """Split one batch by (day, org) and write a part file per partition."""
+    schema = pa.schema(
+        [(name, typ) for name, typ, _ in spec["columns"]],
+        metadata={"schema_version": str(spec["schema_version"])},
+    )
+    partitions = defaultdict(list)
+    for row in rows:
+        day = spec["day"](row)
+        key = (day.strftime("%Y-%m-%d") if day else "unknown", spec["org"](row))
+        partitions[key].append(row)
+    for (day, org), part_rows in partitions.items():
+        columns = {}
+        for name, _, convert in spec["columns"]:
+            values = [getattr(row, name) for row in part_rows]
+            columns[name] = [convert(v) for v in values] if convert else values
+        directory = os.path.join(out_dir, table, f"day={day}", f"org={org}")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{part_rows[0].id:09d}-{part_rows[-1].id:09d}.parquet")
+        tmp = path + ".tmp"
+        pq.write_table(pa.table(columns, schema=schema), tmp, compression=EXPORT_COMPRESSION)
+        os.replace(tmp, path)
+
+
+def _spec(table):
+    if pa is None:
+        raise RuntimeError("pyarrow is required for Parquet export (pip install pyarrow)")
+    return TABLES[table]()
+
+
+def _max_id(db, table):
+    model = _spec(table)["model"]
+    return db.session.query(func.max(model.id)).scalar() or 0
+
+
+def export_table(db, table, out_dir, batch_size=EXPORT_BATCH_SIZE, until_id=None):
+    """Append rows of `table` past its watermark, up to `until_id`, to the Parquet tree; returns rows exported.
+
+    Without `until_id`, the table's current highest id is used after waiting
+    `EXPORT_COMMIT_LAG` seconds.
+    """
+    spec = _spec(table)
+    if until_id is None:
+        until_id = _max_id(db, table)
+        time.sleep(EXPORT_COMMIT_LAG)
+    model = spec["model"]
+    os.makedirs(out_dir, exist_ok=True)
+    watermarks = _load_watermarks(out_dir)
+    state = watermarks.get(table, {"last_id": 0})
+    if state.get("schema_version", spec["schema_version"]) != spec["schema_version"]:
+        print(f"[parquet-export] {table}: schema version {state['schema_version']} -> "
+              f"{spec['schema_version']}; earlier part files lack the new columns")
+    columns = [getattr(model, name) for name, _, _ in spec["columns"]]
+    stmt = select(*columns).where(model.id > state["last_id"], model.id <= until_id).order_by(model.id)
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    exported = 0
+    for rows in result.partitions():
+        _write_partitions(out_dir, table, spec, rows)
+        exported += len(rows)
+        watermarks[table] = {"last_id": rows[-1].id, "schema_version": spec["schema_version"]}
+        _save_watermarks(out_dir, watermarks)
+    return exported
+
+
+@click.command("export-parquet")
+@click.option("--out", "out_dir", default="exports", show_default=True, help="Root directory of the Parquet tree")
+@click.option("--table", "tables", multiple=True, type=click.Choice(sorted(TABLES)), help="Tables to export (default: all)")
+@click.option("--batch-size", default=EXPORT_BATCH_SIZE, show_default=True)
+@with_appcontext
+def export_parquet(out_dir, tables, batch_size):
+    """Incrementally export tables to day/org-partitioned Parquet files."""
+    from estatecore_backend.models import db
+    tables = tables or sorted(TABLES)
+    # One wait for every table's in-flight transactions.
+    until = {table: _max_id(db, table) for table in tables}
+    time.sleep(EXPORT_COMMIT_LAG)
+    for table in tables:
+        count = export_table(db, table, out_dir, batch_size, until_id=until[table])
+        click.echo(f"{table}: {count} rows exported")
+
+
+def register_commands(app):
+    app.cli.add_command(export_parquet)
@@ -0,0 +1,150 @@
+"""
+Atomic entitlement checks for payment‑gated access.
+
+`Payment.is_valid()` followed by `Payment.consume_use()` loads the row,
+decrements `remaining_uses` in Python and flushes it back, so two gate
+events for the same plate can both spend the last use.  The functions here
+check validity and spend the use in the database instead:
+
+* `consume` issues one conditional ``UPDATE ... WHERE <valid> RETURNING``
+  per decision.  Only a row that is valid at that moment is updated, so the
+  check and the decrement cannot be separated by a concurrent request.  On
+  databases without ``UPDATE ... RETURNING`` (SQLite before 3.35, MySQL) the
+  same conditional UPDATE is used and the updated row is read back;
+* `consume_many` replays a batch of queued gate events (e.g. from an edge
+  device that was offline) with one locking SELECT and one executemany
+  UPDATE, falling back to `consume` per event if a concurrent decision
+  changed a row in between.
+
+The statements target the ``payment`` table of the `Payment` model
+directly rather than the ORM model, so no objects are loaded into the
+session.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, case, or_, select, update
+
+from . import db
+from .models import Payment
+
+payment = Payment.__table__
+
+_RETURNED = (payment.c.id, payment.c.payment_type, payment.c.remaining_uses, payment.c.valid_until)
+
+
+class Decision(NamedTuple):
+    """Outcome of one gate event; `remaining_uses` is the count after this use."""
+
+    granted: bool
+    payment_id: Optional[int] = None
+    payment_type: Optional[str] = None
+    remaining_uses: Optional[int] = None
+    valid_until: Optional[datetime] = None
+
+
+DENIED = Decision(False)
+
+
+def _valid(now: datetime):
+    """SQL form of `Payment.is_valid`."""
+    return or_(
+        and_(payment.c.payment_type == "monthly", payment.c.valid_until >= now),
+        and_(payment.c.payment_type == "per_use", payment.c.remaining_uses > 0),
+    )
+
+
+def _decision(row) -> Decision:
+    if row is None:
+        return DENIED
+    return Decision(True, row.id, row.payment_type, row.remaining_uses, row.valid_until)
+
+
+def consume(plate: str, at_time: Optional[datetime] = None, session=None, commit: bool = True) -> Decision:
+    """Check the entitlement for `plate` and spend one use if it is per‑use.
+
+    Monthly payments are only checked.  Returns `DENIED` for unknown plates,
+    expired subscriptions and exhausted credits.
+    """
+    session = session or db.session
+    now = at_time or datetime.utcnow()
+    stmt = (
+        update(payment)
+        .where(payment.c.plate == plate, _valid(now))
+        .values(
+            remaining_uses=case(
+                (payment.c.payment_type == "per_use", payment.c.remaining_uses - 1),
+                else_=payment.c.remaining_uses,
+            )
+        )
+    )
+    if session.get_bind().dialect.update_returning:
+        row = session.execute(stmt.returning(*_RETURNED)).first()
+    elif session.execute(stmt).rowcount == 1:
+        # The conditional UPDATE already decided; the row stays locked until commit.
+        row = session.execute(select(*_RETURNED).where(payment.c.plate == plate)).first()
+    else:
+        row = None
+    if commit:
+        session.commit()
+    return _decision(row)
+
+
+def consume_many(events: Iterable[Tuple[str, Optional[datetime]]], session=None) -> List[Decision]:
+    """Replay queued ``(plate, at_time)`` gate events; decisions in input order.
+
+    Events are applied in time order, so a per‑use credit with two uses left
+    grants the two earliest events for that plate.  Everything is committed
+    in one transaction.
+    """
+    session = session or db.session
+    now = datetime.utcnow()
+    events = [(plate, at_time or now) for plate, at_time in events]
+    if not events:
+        return []
+    order = sorted(range(len(events)), key=lambda i: events[i][1])
+    bind = session.get_bind()
+
+    stmt = (
+        select(payment.c.plate, *_RETURNED)
+        .where(payment.c.plate.in_({plate for plate, _ in events}))
+        .order_by(payment.c.id)
+        .with_for_update()
+    )
+    rows = {row.plate: row for row in session.execute(stmt)}
+    remaining = {plate: row.remaining_uses for plate, row in rows.items() if row.payment_type == "per_use"}
+
+    decisions: List[Decision] = [DENIED] * len(events)
+    for i in order:
+        plate, at_time = events[i]
+        row = rows.get(plate)
+        if row is None:
+            continue
+        if row.payment_type == "monthly":
+            if row.valid_until is not None and row.valid_until >= at_time:
+                decisions[i] = Decision(True, row.id, row.payment_type, row.remaining_uses, row.valid_until)
+        elif row.payment_type == "per_use" and (remaining[plate] or 0) > 0:
+            remaining[plate] -= 1
+            decisions[i] = Decision(True, row.id, row.payment_type, remaining[plate], row.valid_until)
+
+    changes = [
+        {"_id": rows[plate].id, "_expected": rows[plate].remaining_uses, "_new": uses}
+        for plate, uses in remaining.items()
+        if uses != rows[plate].remaining_uses
+    ]
+    if changes:
+        # Guarded on the value read above in case the database ignores FOR UPDATE.
+        result = session.execute(
+            update(payment)
+            .where(payment.c.id == bindparam("_id"), payment.c.remaining_uses == bindparam("_expected"))
+            .values(remaining_uses=bindparam("_new")),
+            changes,
+        )
+        if bind.dialect.supports_sane_multi_rowcount and result.rowcount != len(changes):
+            session.rollback()
+            decisions = [DENIED] * len(events)
+            for i in order:
+                decisions[i] = consume(events[i][0], events[i][1], session, commit=False)
+    session.commit()
+    return decisions
@@ -91,7 +91,12 @@ class Payment(db.Model):
         return False
 
     def consume_use(self) -> bool:
-        """Decrement a per‑use payment and return True if successful."""
+        """Decrement a per‑use payment and return True if successful.
+
+        This is a read‑modify‑write in Python and races under concurrent gate
+        events; the gate endpoints (``POST /access/check`` and
+        ``/access/replay``) go through `app.entitlements` instead.
+        """
         if self.payment_type != 'per_use':
             return False
         if self.remaining_uses and self.remaining_uses > 0:
@@ -101,6 +106,18 @@ class Payment(db.Model):
 
 
 class LPREvent(db.Model):
+    """A licence plate read reported by a camera.
+
+    The composite indexes end in ``(timestamp, id)`` so that event queries
+    filtered by plate or camera can page with a keyset cursor.
+    """
+
+    __table_args__ = (
+        db.Index("ix_lpr_event_timestamp_id", "timestamp", "id"),
+        db.Index("ix_lpr_event_plate_timestamp_id", "plate", "timestamp", "id"),
+        db.Index("ix_lpr_event_camera_timestamp_id", "camera", "timestamp", "id"),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     plate = db.Column(db.String(32), nullable=False)
     confidence = db.Column(db.Float)
@@ -125,7 +142,11 @@ class RentInvoice(db.Model):
     property = db.relationship('Property', backref='rent_invoices')
 
 
-class Payment(db.Model):
+class RentPayment(db.Model):
+    """A tenant's payment towards a rent invoice."""
+
+    __tablename__ = "rent_payment"
+
     id = db.Column(db.Integer, primary_key=True)
     tenant_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     invoice_id = db.Column(db.Integer, db.ForeignKey('rent_invoice.id'), nullable=True)
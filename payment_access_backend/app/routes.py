@@ -4,6 +4,10 @@ from datetime import datetime, timedelta
 import uuid
 from functools import wraps
 
+from estatecore_backend.utils.timeparse import parse_utc_time
+
+from .entitlements import consume, consume_many
+
 main = Blueprint('main', __name__)
 
 # -----------------------------
@@ -83,6 +87,51 @@ def super_admin_overview():
         'total_rent_collected': round(total_paid, 2),
         'total_outstanding': round(total_due - total_paid, 2)
     }), 200
+
+# -----------------------------
+# Payment-Gated Gate Access
+# -----------------------------
+def _event_time(value):
+    """Optional event time of a queued gate event (naive UTC)."""
+    return parse_utc_time(value) if value else None
+
+
+def _decision_json(decision):
+    return {
+        'granted': decision.granted,
+        'payment_type': decision.payment_type,
+        'remaining_uses': decision.remaining_uses,
+        'valid_until': decision.valid_until.isoformat() if decision.valid_until else None,
+    }
+
+
+@main.route('/access/check', methods=['POST'])
+@require_roles('super_admin', 'property_manager', 'property_admin')
+def gate_access_check():
+    """Decide one live gate event at server time; a per-use credit is spent atomically when granted.
+
+    Events that happened earlier (an offline gate catching up) go to
+    ``/access/replay``.
+    """
+    data = request.get_json(silent=True) or {}
+    plate = (data.get('plate') or '').strip()
+    if not plate:
+        return jsonify({'error': 'plate is required'}), 400
+    return jsonify(_decision_json(consume(plate))), 200
+
+
+@main.route('/access/replay', methods=['POST'])
+@require_roles('super_admin', 'property_manager', 'property_admin')
+def gate_access_replay():
+    """Decide gate events queued by an offline gate, in one transaction."""
+    data = request.get_json(silent=True)
+    if not isinstance(data, list):
+        return jsonify({'error': 'expected a JSON list of events'}), 400
+    try:
+        events = [((event.get('plate') or '').strip(), _event_time(event.get('timestamp'))) for event in data]
+    except (AttributeError, TypeError, ValueError):
+        return jsonify({'error': 'each event needs a plate and an optional ISO 8601 or UNIX timestamp'}), 400
+    return jsonify([_decision_json(decision) for decision in consume_many(events)]), 200
 from io import BytesIO
 from flask import send_file
 from reportlab.lib.pagesizes import letter
@@ -1,10 +1,16 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import requests
 from streamlit_autorefresh import st_autorefresh
 
-API_URL = "http://127.0.0.1:5000/events"
-CSV_URL = "http://127.0.0.1:5000/events.csv"
+API_URL = os.environ.get("LPR_API_URL", "http://127.0.0.1:5000/api/lpr_events")
+POLL_URL = f"{API_URL}/poll"
+CSV_URL = f"{API_URL}/csv"
+ROLLUP_URL = os.environ.get("LPR_ROLLUP_URL", "http://127.0.0.1:5000/api/rollups")
+# Events kept in this dashboard session.
+MAX_ROWS = 500
 
 st.set_page_config("LPR Events Dashboard", layout="wide")
 st.title("License Plate Events Dashboard")
@@ -13,20 +19,64 @@ st.sidebar.header("Controls")
 auto_refresh = st.sidebar.checkbox("Auto-refresh", value=True)
 refresh_interval = st.sidebar.slider("Refresh interval (sec)", 2, 30, 5)
 
-@st.cache_data(ttl=2)
+def load_initial():
+    """Fetch the newest events once per session, plus the live-feed cursor."""
+    cursor = requests.get(POLL_URL, timeout=3).json()["cursor"]
+    events = requests.get(API_URL, params={"limit": MAX_ROWS}, timeout=10).json()
+    st.session_state.events = events
+    st.session_state.cursor = max([cursor] + [ev["id"] for ev in events])
+
+def fetch_new_events():
+    """Append only events newer than the session cursor (no full re-query)."""
+    resp = requests.get(
+        POLL_URL, params={"since": st.session_state.cursor, "timeout": 0}, timeout=3
+    ).json()
+    seen = {ev["id"] for ev in st.session_state.events}
+    new = [ev for ev in resp["events"] if ev["id"] not in seen]
+    st.session_state.events = (new[::-1] + st.session_state.events)[:MAX_ROWS]
+    st.session_state.cursor = resp["cursor"]
+
 def fetch_events():
     try:
-        resp = requests.get(API_URL, timeout=3)
-        data = resp.json()
-        df = pd.DataFrame(data)
-        if not df.empty and 'created_at' in df.columns:
-            df['created_at'] = pd.to_datetime(df['created_at'])
-            df = df.sort_values("created_at", ascending=False)
-        return df
+        if "cursor" not in st.session_state:
+            load_initial()
+        else:
+            fetch_new_events()
     except Exception as e:
         st.error(f"Error fetching data: {e}")
+    df = pd.DataFrame(st.session_state.get("events", []))
+    if not df.empty and 'timestamp' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+    return df
+
+@st.cache_data(ttl=60)
+def fetch_rollups(kind, period, limit):
+    """Pre-aggregated counts; the backend never scans raw rows for these."""
+    try:
+        resp = requests.get(f"{ROLLUP_URL}/{kind}", params={"period": period, "limit": limit}, timeout=5)
+        df = pd.DataFrame(resp.json())
+        if not df.empty:
+            df['bucket_start'] = pd.to_datetime(df['bucket_start'])
+        return df
+    except Exception as e:
+        st.error(f"Error fetching rollups: {e}")
         return pd.DataFrame()
 
+def render_activity():
+    st.markdown("### Activity")
+    days = fetch_rollups("lpr", "day", 200)
+    if not days.empty:
+        today = days[days['bucket_start'] == days['bucket_start'].max()]
+        col1, col2 = st.columns(2)
+        col1.metric("Plate reads today", int(today['events'].sum()))
+        col2.metric("Unique plates today (max per camera)", int(today['unique_plates'].max()))
+    hours = fetch_rollups("lpr", "hour", 24 * 7 * 8)
+    if not hours.empty:
+        st.line_chart(hours.pivot_table(index='bucket_start', columns='camera', values='events', aggfunc='sum'))
+    access = fetch_rollups("access", "day", 30 * 8)
+    if not access.empty:
+        st.bar_chart(access.groupby('bucket_start')[['granted', 'denied']].sum())
+
 def render_table(df):
     if df.empty:
         st.warning("No events found.")
@@ -38,12 +88,8 @@ if auto_refresh:
 
 df = fetch_events()
 render_table(df)
+render_activity()
 
-# Download CSV
+# Download CSV (streamed by the backend only when the link is followed)
 st.markdown("### Export Data")
-st.download_button(
-    label="Download CSV",
-    data=requests.get(CSV_URL).content,
-    file_name="lpr_events.csv",
-    mime="text/csv"
-)
+st.markdown(f"[Download CSV]({CSV_URL}) · [Download CSV (gzip)]({CSV_URL}?gzip=1)")
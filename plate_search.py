@@ -0,0 +1,201 @@
+"""OCR-tolerant licence plate search.
+
+OCR regularly confuses characters that look alike ("O"/"0", "B"/"8",
+"I"/"1", "S"/"5"), so exact ``plate == ...`` lookups miss reads of the same
+vehicle.  Plates are therefore compared in a *canonical* form in which every
+confusion class collapses to one character, and fuzzy queries are answered
+from an in-process index:
+
+* `canonical_plate` normalizes a plate (upper case, alphanumerics only,
+  confusion classes folded);
+* `PlateIndex` keeps two filters over canonical plates and uses, per query,
+  the one with the smaller posting lists; edit distances are then computed
+  only for the candidates it returns:
+
+  - trigram counting: a plate within ``d`` edits shares at least
+    ``len(trigrams) - 3d`` trigrams with the query (an edit changes at most
+    three).  Selective for long queries and small distances;
+  - pigeonhole over positional 1- and 2-grams: split the query into
+    ``d + 2`` pieces; ``d`` edits leave two pieces intact, each found in the
+    plate at most ``d`` positions from where it is in the query.  One gram
+    per piece is looked up, chosen to minimise the postings read, and a
+    candidate must hit two of them.  This stays selective where the trigram
+    bound is useless (6-character plates at distance 2, 7 at 3).
+
+  Queries shorter than ``d + 1`` characters read the plates of the possible
+  lengths.  Queries stay in the millisecond range with millions of events
+  behind a few hundred thousand distinct plates.
+
+The index holds distinct plates, not events; callers load it from the
+database and look the events up by plate.
+"""
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# Characters OCR confuses, folded onto one representative each.
+CONFUSION_CLASSES = ("0ODQ", "1IL", "2Z", "5S", "6G", "8B")
+_FOLD = {ch: group[0] for group in CONFUSION_CLASSES for ch in group}
+_NON_ALNUM = re.compile(r"[^0-9A-Z]")
+
+
+def normalize_plate(plate: str) -> str:
+    """Upper-case `plate` and drop spaces, dashes and other separators."""
+    return _NON_ALNUM.sub("", (plate or "").upper())
+
+
+def canonical_plate(plate: str) -> str:
+    """Normalized plate with every OCR confusion class folded to one character."""
+    return "".join(_FOLD.get(ch, ch) for ch in normalize_plate(plate))
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Levenshtein distance; stops early once every path exceeds `limit`."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def trigrams(canonical: str) -> Set[str]:
+    padded = f"^{canonical}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class PlateIndex:
+    """Trigram and positional q-gram index over canonical plates, mapping back to the stored plates."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._plates: Dict[str, Set[str]] = {}
+        self._grams: Dict[str, Set[str]] = {}
+        # (1- or 2-gram, start position) -> canonical plates
+        self._positional: Dict[Tuple[str, int], Set[str]] = {}
+        self._by_length: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(plates) for plates in self._plates.values())
+
+    def add(self, plate: str) -> None:
+        self.add_many([plate])
+
+    def add_many(self, plates: Iterable[str]) -> None:
+        with self._lock:
+            for plate in plates:
+                canonical = canonical_plate(plate)
+                if not canonical:
+                    continue
+                stored = self._plates.get(canonical)
+                if stored is None:
+                    stored = self._plates[canonical] = set()
+                    for gram in trigrams(canonical):
+                        self._grams.setdefault(gram, set()).add(canonical)
+                    for i in range(len(canonical)):
+                        self._positional.setdefault((canonical[i], i), set()).add(canonical)
+                        if i + 1 < len(canonical):
+                            self._positional.setdefault((canonical[i:i + 2], i), set()).add(canonical)
+                    self._by_length.setdefault(len(canonical), set()).add(canonical)
+                stored.add(plate)
+
+    def matches(self, plate: str) -> Set[str]:
+        """Stored plates that are identical to `plate` up to OCR confusions."""
+        with self._lock:
+            return set(self._plates.get(canonical_plate(plate), ()))
+
+    def search(self, plate: str, max_distance: int = 2, limit: int = 20) -> List[Tuple[str, int]]:
+        """Stored plates within `max_distance` edits of `plate`, closest first.
+
+        Distances are measured between canonical forms, so OCR confusions
+        cost nothing; ties are broken by the distance between the normalized
+        plates and then alphabetically.
+        """
+        canonical = canonical_plate(plate)
+        if not canonical:
+            return []
+        with self._lock:
+            candidates = self._candidates(canonical, max_distance)
+            hits = []
+            for candidate in candidates:
+                if abs(len(candidate) - len(canonical)) > max_distance:
+                    continue
+                distance = edit_distance(canonical, candidate, max_distance)
+                if distance <= max_distance:
+                    for stored in self._plates[candidate]:
+                        hits.append((distance, stored))
+        normalized = normalize_plate(plate)
+        hits.sort(key=lambda hit: (hit[0], edit_distance(normalized, normalize_plate(hit[1])), hit[1]))
+        return [(stored, distance) for distance, stored in hits[:limit]]
+
+    def _postings(self, gram: str, position: int, max_distance: int) -> int:
+        return sum(
+            len(self._positional.get((gram, position + shift), ()))
+            for shift in range(-max_distance, max_distance + 1)
+        )
+
+    def _pieces(self, canonical: str, max_distance: int, count: int) -> Tuple[int, List[Tuple[str, int]]]:
+        """Cheapest split of `canonical` into `count` pieces, one ``(gram, position)`` each.
+
+        Returns the total postings to read and the grams to look up.
+        """
+        n = len(canonical)
+        # Cheapest gram (unigram, or any bigram inside the piece) per piece [i, j).
+        unigram = [(self._postings(canonical[i], i, max_distance), canonical[i], i) for i in range(n)]
+        bigram = [(self._postings(canonical[i:i + 2], i, max_distance), canonical[i:i + 2], i) for i in range(n - 1)]
+        piece = {}
+        for i in range(n):
+            best = unigram[i]
+            piece[i, i + 1] = best
+            for j in range(i + 2, n + 1):
+                best = min(best, bigram[j - 2])
+                piece[i, j] = best
+        # best[j]: cheapest split of canonical[:j] into k pieces, for growing k.
+        best = {0: (0, [])}
+        for k in range(count):
+            nxt = {}
+            for i, (cost, grams) in best.items():
+                for j in range(i + 1, n - (count - 1 - k) + 1):
+                    piece_cost, gram, position = piece[i, j]
+                    if j not in nxt or cost + piece_cost < nxt[j][0]:
+                        nxt[j] = (cost + piece_cost, grams + [(gram, position)])
+            best = nxt
+        return best[n]
+
+    def _candidates(self, canonical: str, max_distance: int) -> Set[str]:
+        """Canonical plates that may be within `max_distance` edits of `canonical`."""
+        lengths = range(max(1, len(canonical) - max_distance), len(canonical) + max_distance + 1)
+        if len(canonical) <= max_distance:
+            # Too short to split: every plate of a reachable length.
+            return set().union(*(self._by_length.get(length, ()) for length in lengths))
+        grams = trigrams(canonical)
+        # Each edit destroys at most three of the query's trigrams.
+        needed = len(grams) - 3 * max_distance
+        trigram_cost = sum(len(self._grams.get(gram, ())) for gram in grams) if needed > 0 else None
+        # Split into one piece more than the edits allow for when there is room,
+        # so that a candidate has to keep two pieces.
+        intact = 2 if len(canonical) >= max_distance + 2 else 1
+        pigeonhole_cost, pieces = self._pieces(canonical, max_distance, max_distance + intact)
+        shared: Counter = Counter()
+        if trigram_cost is not None and trigram_cost <= pigeonhole_cost:
+            for gram in grams:
+                shared.update(self._grams.get(gram, ()))
+            return {c for c, count in shared.items() if count >= needed}
+        for gram, position in pieces:
+            hit: Set[str] = set()
+            for shift in range(-max_distance, max_distance + 1):
+                hit.update(self._positional.get((gram, position + shift), ()))
+            shared.update(hit)
+        return {c for c, count in shared.items() if count >= intact}
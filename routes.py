@@ -1,58 +1,180 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify
 from .extensions import db
 from estatecore_backend.models import User, RentRecord, AccessLog
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from datetime import datetime
+from sqlalchemy import tuple_
+import base64
+import threading
+import time
+
+from .access_cache import DecisionMemo, EntitlementCache, Entitlement, bind_invalidation
+from .access_log_writer import AccessLogWriter
+from .gate_allowlist import AllowlistPublisher
+from .plate_search import PlateIndex
+from .utils.timeparse import parse_utc_time
 
 api_bp = Blueprint("api", __name__)
 
+# Seconds before the index of registered plates is rebuilt.
+USER_PLATE_INDEX_TTL = 60
+# Page size of GET /access-logs without / above an explicit `limit`.
+ACCESS_LOG_QUERY_DEFAULT_LIMIT = 20
+ACCESS_LOG_QUERY_MAX_LIMIT = 1000
+# Format of AccessLog.time
+ACCESS_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_user_plate_index = None
+_user_plate_index_built = 0.0
+_user_plate_index_lock = threading.Lock()
+
+
+def get_user_plate_index():
+    """Plate search index over `User.plate`, rebuilt every `USER_PLATE_INDEX_TTL` seconds."""
+    global _user_plate_index, _user_plate_index_built
+    with _user_plate_index_lock:
+        if _user_plate_index is None or time.monotonic() - _user_plate_index_built >= USER_PLATE_INDEX_TTL:
+            index = PlateIndex()
+            index.add_many(plate for (plate,) in User.query.with_entities(User.plate) if plate)
+            _user_plate_index, _user_plate_index_built = index, time.monotonic()
+        return _user_plate_index
+
+
+def find_user_by_plate(plate):
+    """Look up the user registered for `plate`, tolerating OCR confusions.
+
+    An exact match wins.  Otherwise the plate is accepted only if exactly one
+    registered plate has the same canonical form (O/0, B/8, I/1, S/5...);
+    near misses by edit distance never open the gate.
+    """
+    user = User.query.filter_by(plate=plate).first()
+    if user:
+        return user
+    matches = get_user_plate_index().matches(plate)
+    if len(matches) != 1:
+        return None
+    return User.query.filter_by(plate=matches.pop()).first()
+
+def reset_user_plate_index():
+    global _user_plate_index
+    with _user_plate_index_lock:
+        _user_plate_index = None
+
+
+def load_entitlement(plate):
+    """Uncached entitlement lookup: user by plate, then a paid rent record."""
+    user = find_user_by_plate(plate)
+    if not user:
+        return None
+    paid = RentRecord.query.filter_by(name=user.name, status="Paid").first() is not None
+    return Entitlement(user.id, user.name, paid)
+
+
+def load_allowlist():
+    """All entitlements at once for the edge allowlist, decided as in `load_entitlement`."""
+    users = User.query.with_entities(User.id, User.name, User.plate).filter(User.plate.isnot(None)).order_by(User.id).all()
+    paid = {name for (name,) in RentRecord.query.with_entities(RentRecord.name).filter_by(status="Paid").distinct()}
+    entitled = [(user.plate, user.id) for user in users if user.name in paid]
+    return entitled, [user.plate for user in users]
+
+
+entitlement_cache = EntitlementCache(load_entitlement)
+decision_memo = DecisionMemo()
+allowlist_publisher = AllowlistPublisher(load_allowlist)
+bind_invalidation(
+    (User, RentRecord),
+    entitlement_cache.invalidate, decision_memo.invalidate, reset_user_plate_index, allowlist_publisher.invalidate,
+)
+access_log_writer = AccessLogWriter(db, AccessLog)
+
+def _log_decision(plate, door, now, user, status, body, code=200):
+    """Log a gate decision and remember it for repeats of `plate` at `door`."""
+    entry = access_log_writer.write(time=now.strftime(ACCESS_TIME_FORMAT), timestamp=now, user=user, door=door, status=status)
+    decision_memo.put(plate, door, body, code, entry)
+    return jsonify(body), code
+
 # ---- Access Check ----
 @api_bp.route("/access/check", methods=["POST"])
 def access_check():
     data = request.get_json() or {}
     plate = data.get("plate")
+    door = data.get("door") or "GATE"
 
     now = datetime.utcnow()
-    timestamp = now.strftime("%Y-%m-%d %H:%M:%S")
+    timestamp = now.strftime(ACCESS_TIME_FORMAT)
 
     if not plate:
-        log = AccessLog(time=timestamp, user="UNKNOWN", door="GATE", status="denied - no plate")
-        db.session.add(log)
-        db.session.commit()
+        access_log_writer.write(time=timestamp, timestamp=now, user="UNKNOWN", door=door, status="denied - no plate")
         return jsonify({"access": "denied", "reason": "Plate missing"}), 400
 
-    user = User.query.filter_by(plate=plate).first()
-    if not user:
-        log = AccessLog(time=timestamp, user=plate, door="GATE", status="denied - unknown plate")
-        db.session.add(log)
-        db.session.commit()
-        return jsonify({"access": "denied", "reason": "Unknown plate"}), 404
-
-    rent = RentRecord.query.filter_by(name=user.name, status="Paid").first()
+    # Same plate at the same door moments ago: answer as then, count the repeat.
+    repeat = decision_memo.get(plate, door)
+    if repeat is not None:
+        access_log_writer.bump(repeat.log_entry)
+        return jsonify(repeat.body), repeat.status
 
-    if rent:
-        log = AccessLog(time=timestamp, user=user.name, door="GATE", status="granted")
-        db.session.add(log)
-        db.session.commit()
+    entitlement = entitlement_cache.get(plate)
+    if entitlement.user_id is None:
+        return _log_decision(plate, door, now, plate, "denied - unknown plate",
+                             {"access": "denied", "reason": "Unknown plate"}, 404)
 
+    if entitlement.paid:
         # 🔁 Optional relay trigger
         # import requests
         # requests.post("http://your-relay-device/unlock")
 
-        return jsonify({"access": "granted", "user_id": user.id})
+        return _log_decision(plate, door, now, entitlement.user_name, "granted",
+                             {"access": "granted", "user_id": entitlement.user_id})
     else:
-        log = AccessLog(time=timestamp, user=user.name, door="GATE", status="denied - unpaid rent")
-        db.session.add(log)
-        db.session.commit()
-        return jsonify({"access": "denied", "reason": "Unpaid rent"})
+        return _log_decision(plate, door, now, entitlement.user_name, "denied - unpaid rent",
+                             {"access": "denied", "reason": "Unpaid rent"})
+
+@api_bp.route("/access/cache-stats", methods=["GET"])
+@jwt_required()
+def access_cache_stats():
+    return jsonify(dict(entitlement_cache.stats(), burst=decision_memo.stats()))
+
+@api_bp.route("/access/allowlist", methods=["GET"])
+@jwt_required()
+def access_allowlist():
+    """Binary snapshot of entitled plates for offline gate controllers."""
+    snapshot = allowlist_publisher.current()
+    # The bytes (and ETag) change with generated_at even when the records do not.
+    etag = f"{snapshot.version}-{snapshot.generated_at:.6f}"
+    if etag in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        resp = Response(snapshot.data, mimetype="application/octet-stream")
+    resp.set_etag(etag)
+    resp.headers["X-Allowlist-Version"] = snapshot.version
+    return resp
+
+@api_bp.route("/access/allowlist/delta", methods=["GET"])
+@jwt_required()
+def access_allowlist_delta():
+    """Changes since snapshot `since`; 410 when the client must download a full snapshot."""
+    delta = allowlist_publisher.delta(request.args.get("since", ""))
+    if delta is None:
+        return jsonify({"msg": "Unknown allowlist version, download /access/allowlist"}), 410
+    return jsonify(delta)
+
+@api_bp.route("/access/log-writer-stats", methods=["GET"])
+@jwt_required()
+def access_log_writer_stats():
+    return jsonify(access_log_writer.stats())
 
 # ---- Simulate Access Log ----
 @api_bp.route("/access-logs/simulate", methods=["POST"])
 @jwt_required()
 def simulate_log():
     data = request.get_json() or {}
+    time_str = data.get("time", datetime.utcnow().strftime(ACCESS_TIME_FORMAT))
+    try:
+        timestamp = datetime.strptime(time_str, ACCESS_TIME_FORMAT)
+    except (TypeError, ValueError):
+        timestamp = None
     log = AccessLog(
-        time=data.get("time", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")),
+        time=time_str,
+        timestamp=timestamp,
         user=data.get("user", "SimUser"),
         door=data.get("door", "SimDoor"),
         status=data.get("status", "SimStatus")
@@ -62,16 +184,70 @@ def simulate_log():
     return jsonify({"msg": "Log simulated"})
 
 # ---- View Access Logs ----
+def _encode_log_cursor(log):
+    raw = f"{log.timestamp.isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def _decode_log_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, log_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("invalid cursor")
+
+def _access_log_query(args):
+    """Filtered `AccessLog` query, newest first, from request arguments.
+
+    Supports `since`, `until`, `door`, `user` and `status` (a status prefix,
+    so ``denied`` matches every denial reason).  Ordered by ``(timestamp, id)``
+    descending to page over the composite indexes.  Raises ValueError on
+    malformed arguments.
+    """
+    query = AccessLog.query.filter(AccessLog.timestamp.isnot(None))
+    if args.get("door"):
+        query = query.filter(AccessLog.door == args["door"])
+    if args.get("user"):
+        query = query.filter(AccessLog.user == args["user"])
+    if args.get("status"):
+        query = query.filter(AccessLog.status.startswith(args["status"], autoescape=True))
+    if args.get("since"):
+        query = query.filter(AccessLog.timestamp >= parse_utc_time(args["since"]))
+    if args.get("until"):
+        query = query.filter(AccessLog.timestamp < parse_utc_time(args["until"]))
+    if args.get("cursor"):
+        query = query.filter(tuple_(AccessLog.timestamp, AccessLog.id) < tuple_(*_decode_log_cursor(args["cursor"])))
+    return query.order_by(AccessLog.timestamp.desc(), AccessLog.id.desc())
+
 @api_bp.route("/access-logs", methods=["GET"])
 @jwt_required()
 def access_logs():
-    logs = AccessLog.query.order_by(AccessLog.id.desc()).limit(20).all()
-    return jsonify([{
+    """Access logs, newest first, filtered as in `_access_log_query`.
+
+    Returns `limit` rows (default 20); when more exist, the cursor for the
+    next page is in the ``X-Next-Cursor`` header.
+    """
+    try:
+        limit = int(request.args.get("limit", ACCESS_LOG_QUERY_DEFAULT_LIMIT))
+        query = _access_log_query(request.args)
+    except ValueError as exc:
+        return jsonify({"msg": str(exc)}), 400
+    limit = max(1, min(limit, ACCESS_LOG_QUERY_MAX_LIMIT))
+
+    logs = query.limit(limit + 1).all()
+    response = jsonify([{
+        "id": l.id,
         "time": l.time,
+        "timestamp": l.timestamp.isoformat(),
         "user": l.user,
         "door": l.door,
-        "status": l.status
-    } for l in logs])
+        "status": l.status,
+        "repeat_count": l.repeat_count
+    } for l in logs[:limit]])
+    if len(logs) > limit:
+        response.headers["X-Next-Cursor"] = _encode_log_cursor(logs[limit - 1])
+    return response
+
 @api_bp.route("/relay/unlock", methods=["POST"])
 @jwt_required()
 def manual_unlock():
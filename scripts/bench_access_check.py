@@ -0,0 +1,307 @@
+"""Load benchmark for the gate access check (POST /access/check).
+
+Seeds a throwaway database with users, plates and rent records, then drives
+``/access/check`` twice:
+
+* through the Flask test client (no network, one thread) - app cost only;
+* over HTTP against a threaded local server, from `--threads` clients with
+  keep-alive connections - adds WSGI/socket overhead and contention.
+
+For every request the server side measures its total time and the time
+spent executing database statements (SQLAlchemy cursor events); app time is
+the difference and includes COMMIT round trips, so it moves with
+``ACCESS_LOG_DURABILITY``.  Throughput and p50/p95/p99 of client latency, server, DB and app
+time are printed and written as JSON, so runs can be compared::
+
+    python scripts/bench_access_check.py --users 10000 --requests 20000 --out bench.json
+    python scripts/bench_access_check.py ... --compare bench.json
+
+The default database is a temporary SQLite file; pass ``--database-url`` with
+an empty (ephemeral) Postgres database to measure against Postgres.  Tables
+are created if missing and the seeded rows are left in place.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(pct / 100.0 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def summarize(samples, wall):
+    """Throughput and latency percentiles (ms) for a list of sample dicts."""
+    result = {"requests": len(samples), "seconds": round(wall, 3),
+              "throughput_rps": round(len(samples) / wall, 1) if wall else None}
+    for key in ("latency", "server", "db", "app"):
+        values = [s[key] * 1000 for s in samples if s.get(key) is not None]
+        if values:
+            result[key + "_ms"] = {
+                "mean": round(sum(values) / len(values), 3),
+                "p50": round(percentile(values, 50), 3),
+                "p95": round(percentile(values, 95), 3),
+                "p99": round(percentile(values, 99), 3),
+                "max": round(max(values), 3),
+            }
+    statuses = {}
+    for s in samples:
+        statuses[str(s["status"])] = statuses.get(str(s["status"]), 0) + 1
+    result["statuses"] = statuses
+    return result
+
+
+class ServerTimer:
+    """Per-request server and DB time, recorded by Flask and SQLAlchemy hooks."""
+
+    def __init__(self, app, engine):
+        from flask import g, request
+        from sqlalchemy import event
+
+        self.local = threading.local()
+        self.records = {}
+        self.lock = threading.Lock()
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            self.local.started = time.perf_counter()
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            if getattr(self.local, "in_request", False):
+                self.local.db += time.perf_counter() - self.local.started
+
+        @app.before_request
+        def _start():
+            self.local.in_request = True
+            self.local.db = 0.0
+            g.bench_started = time.perf_counter()
+
+        @app.after_request
+        def _finish(response):
+            self.local.in_request = False
+            request_id = request.headers.get("X-Bench-Id")
+            if request_id:
+                server = time.perf_counter() - g.bench_started
+                with self.lock:
+                    self.records[request_id] = (server, self.local.db)
+            return response
+
+    def attach(self, sample, request_id):
+        server, db_time = self.records.pop(request_id, (None, None))
+        sample["server"] = server
+        sample["db"] = db_time
+        sample["app"] = server - db_time if server is not None else None
+        return sample
+
+
+def seed(db, models, users, paid_ratio, batch=5000):
+    """Insert `users` users with plates and a paid rent record for `paid_ratio` of them."""
+    from sqlalchemy import insert
+
+    User, RentRecord = models
+    user_columns = set(User.__table__.columns.keys())
+    rent_columns = set(RentRecord.__table__.columns.keys())
+    defaults = {"password_hash": "bench", "role": "tenant"}
+    plates, paid = [], []
+    start = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    for offset in range(0, users, batch):
+        user_rows, rent_rows = [], []
+        for i in range(start + offset, start + min(users, offset + batch)):
+            plate = f"BN{i:07d}"
+            name = f"Bench User {i}"
+            row = {"email": f"bench{i}@example.com", "name": name, "plate": plate, **defaults}
+            user_rows.append({k: v for k, v in row.items() if k in user_columns})
+            plates.append(plate)
+            if random.random() < paid_ratio:
+                paid.append(plate)
+                rent = {"name": name, "status": "Paid", "amount": 0, "month": datetime.utcnow().strftime("%Y-%m")}
+                rent_rows.append({k: v for k, v in rent.items() if k in rent_columns})
+        db.session.execute(insert(User), user_rows)
+        if rent_rows:
+            db.session.execute(insert(RentRecord), rent_rows)
+        db.session.commit()
+    return plates, set(paid)
+
+
+def request_plan(plates, count, unknown_ratio):
+    plan = []
+    for _ in range(count):
+        if random.random() < unknown_ratio:
+            plan.append(f"ZZ{random.randrange(10 ** 7):07d}")
+        else:
+            plan.append(random.choice(plates))
+    return plan
+
+
+def run_test_client(app, timer, plan):
+    client = app.test_client()
+    samples = []
+    started = time.perf_counter()
+    for n, plate in enumerate(plan):
+        request_id = f"tc-{n}"
+        t0 = time.perf_counter()
+        resp = client.post("/access/check", json={"plate": plate}, headers={"X-Bench-Id": request_id})
+        latency = time.perf_counter() - t0
+        samples.append(timer.attach({"latency": latency, "status": resp.status_code}, request_id))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def run_http(app, timer, plan, threads):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port = server.server_port
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    samples = []
+    samples_lock = threading.Lock()
+    chunks = [plan[i::threads] for i in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index, chunk):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        local = []
+        barrier.wait()
+        for n, plate in enumerate(chunk):
+            request_id = f"http-{index}-{n}"
+            body = json.dumps({"plate": plate})
+            t0 = time.perf_counter()
+            conn.request("POST", "/access/check", body=body,
+                         headers={"Content-Type": "application/json", "X-Bench-Id": request_id})
+            resp = conn.getresponse()
+            resp.read()
+            local.append(({"latency": time.perf_counter() - t0, "status": resp.status}, request_id))
+        conn.close()
+        with samples_lock:
+            samples.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i, chunk)) for i, chunk in enumerate(chunks)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+    result = summarize([timer.attach(sample, request_id) for sample, request_id in samples], wall)
+    result["threads"] = threads
+    return result
+
+
+def compare(previous, current):
+    """Print the relative change of throughput and latency percentiles per run mode."""
+    for mode, now in current["results"].items():
+        before = previous.get("results", {}).get(mode)
+        if not before:
+            continue
+        print(f"\n{mode} vs previous run:")
+        rows = [("throughput_rps", before.get("throughput_rps"), now.get("throughput_rps"))]
+        for key in ("latency_ms", "db_ms", "app_ms"):
+            for pct in ("p50", "p95", "p99"):
+                rows.append((f"{key}.{pct}", (before.get(key) or {}).get(pct), (now.get(key) or {}).get(pct)))
+        for name, old, new in rows:
+            if old and new is not None:
+                print(f"  {name:<18} {old:>10} -> {new:<10} ({(new - old) / old * 100:+.1f}%)")
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /access/check.")
+    parser.add_argument("--database-url", help="empty database to use (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--paid-ratio", type=float, default=0.8)
+    parser.add_argument("--unknown-ratio", type=float, default=0.1, help="share of requests with unregistered plates")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--mode", choices=("client", "http", "both"), default="both")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    tmp_dir = None
+    if not args.database_url:
+        tmp_dir = tempfile.mkdtemp(prefix="bench-access-")
+        args.database_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from estatecore_backend import create_app
+    from estatecore_backend.models import db, User, RentRecord
+    from estatecore_backend import routes
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        timer = ServerTimer(app, db.engine)
+        t0 = time.perf_counter()
+        plates, paid = seed(db, (User, RentRecord), args.users, args.paid_ratio)
+        seed_seconds = time.perf_counter() - t0
+        dialect = db.engine.dialect.name
+    print(f"Seeded {len(plates)} users ({len(paid)} paid) into {dialect} in {seed_seconds:.1f}s")
+
+    plan = request_plan(plates, args.requests, args.unknown_ratio)
+    results = {}
+    if args.warmup:
+        run_test_client(app, timer, request_plan(plates, args.warmup, args.unknown_ratio))
+    if args.mode in ("client", "both"):
+        results["test_client"] = run_test_client(app, timer, plan)
+    if args.mode in ("http", "both"):
+        results["http"] = run_http(app, timer, plan, args.threads)
+    routes.access_log_writer.flush(30)
+
+    report = {
+        "meta": {
+            "started_at": datetime.utcnow().isoformat() + "Z",
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "database": dialect,
+            "users": args.users,
+            "paid_ratio": args.paid_ratio,
+            "unknown_ratio": args.unknown_ratio,
+            "requests": args.requests,
+            "threads": args.threads,
+            "seed": args.seed,
+            "access_log_durability": routes.access_log_writer.durability,
+        },
+        "results": results,
+        "entitlement_cache": routes.entitlement_cache.stats(),
+        "access_log_writer": routes.access_log_writer.stats(),
+    }
+    print(json.dumps(report, indent=2))
+    if args.compare:
+        with open(args.compare) as fh:
+            compare(json.load(fh), report)
+    if args.out:
+        with open(args.out, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
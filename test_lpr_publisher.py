@@ -0,0 +1,76 @@
+from lpr_publisher import BatchingPublisher
+from lpr_spool import EventSpool
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.text = ""
+
+    def json(self):
+        return {}
+
+
+class FakeBackend:
+    """Records delivered events; `status` overrides every response while set."""
+
+    def __init__(self, poison=()):
+        self.status = None
+        self.poison = set(poison)
+        self.received = []
+
+    def post(self, url, json):
+        if self.status is not None:
+            return FakeResponse(self.status)
+        if any(event["n"] in self.poison for event in json):
+            return FakeResponse(500)
+        self.received.extend(event["n"] for event in json)
+        return FakeResponse(200)
+
+
+def make_publisher(tmp_path, backend, events=10):
+    spool = EventSpool(str(tmp_path / "spool.sqlite3"))
+    spool.append([{"n": n} for n in range(events)])
+    return BatchingPublisher("http://backend", client=backend, batch_size=4, spool=spool, max_attempts=3)
+
+
+def replay_until_empty(publisher, rounds=100):
+    for _ in range(rounds):
+        if not len(publisher.spool):
+            return
+        publisher._replay()
+
+
+def test_unavailable_backend_never_dead_letters(tmp_path):
+    backend = FakeBackend()
+    publisher = make_publisher(tmp_path, backend)
+    for status in (503, 502, 504):
+        backend.status = status
+        for _ in range(20):
+            publisher._replay()
+    assert publisher.spool.dead_lettered == 0
+    assert len(publisher.spool) == 10
+
+    backend.status = None
+    replay_until_empty(publisher)
+    assert backend.received == list(range(10))
+    assert publisher.spool.dead_lettered == 0
+
+
+def test_poison_event_is_dead_lettered_alone(tmp_path):
+    backend = FakeBackend(poison={5})
+    publisher = make_publisher(tmp_path, backend)
+    replay_until_empty(publisher)
+    assert backend.received == [n for n in range(10) if n != 5]
+    assert publisher.spool.dead_lettered == 1
+    with open(publisher.spool.dead_letter_path) as fh:
+        dead = fh.read()
+    assert '"n": 5' in dead and '"attempts": 3' in dead
+
+
+def test_backoff_is_kept_after_dead_lettering(tmp_path):
+    backend = FakeBackend(poison={0})
+    publisher = make_publisher(tmp_path, backend, events=1)
+    replay_until_empty(publisher)
+    assert publisher.spool.dead_lettered == 1
+    assert publisher._backoff > 1.0
@@ -0,0 +1,52 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from flask import Flask
+
+pytest.importorskip("estatecore_backend")
+
+from payment_access_backend.app import db
+from payment_access_backend.app.entitlements import consume, consume_many, payment
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'payments.db'}"
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"connect_args": {"timeout": 30}}
+    db.init_app(app)
+    with app.app_context():
+        payment.create(db.engine)
+        db.session.execute(payment.insert(), [
+            {"plate": "PERUSE1", "payment_type": "per_use", "valid_until": None, "remaining_uses": 50},
+            {"plate": "MONTH1", "payment_type": "monthly", "valid_until": datetime.utcnow() - timedelta(days=1), "remaining_uses": None},
+        ])
+        db.session.commit()
+    return app
+
+
+def test_concurrent_checks_spend_each_use_once(app):
+    granted = []
+
+    def gate():
+        with app.app_context():
+            for _ in range(20):
+                granted.append(consume("PERUSE1").granted)
+
+    threads = [threading.Thread(target=gate) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(granted) == 160
+    assert granted.count(True) == 50
+    with app.app_context():
+        assert db.session.execute(payment.select().where(payment.c.plate == "PERUSE1")).one().remaining_uses == 0
+
+
+def test_replay_decides_at_event_time(app):
+    with app.app_context():
+        decisions = consume_many([("MONTH1", datetime.utcnow() - timedelta(days=2)), ("MONTH1", None)])
+        assert [d.granted for d in decisions] == [True, False]
+        assert not consume("MONTH1").granted
@@ -0,0 +1,44 @@
+import random
+
+from plate_search import PlateIndex, canonical_plate, edit_distance
+
+
+def make_index(*plates):
+    index = PlateIndex()
+    for plate in plates:
+        index.add(plate)
+    return index
+
+
+def test_exact_and_ocr_confusions_match_at_distance_zero():
+    index = make_index("ABC123", "XYZ789")
+    assert index.search("ABC123") == [("ABC123", 0)]
+    assert index.search("A8C12E", max_distance=0) == []
+    assert index.search("ABCI23", max_distance=0) == [("ABC123", 0)]
+
+
+def test_match_sharing_no_trigram_with_the_query():
+    # Three edits spread over seven characters leave no trigram in common.
+    index = make_index("ABCDEFG")
+    assert index.search("XBCXEFX", max_distance=3) == [("ABCDEFG", 3)]
+    assert index.search("XBCXEFX", max_distance=2) == []
+
+
+def test_results_are_sorted_by_distance_and_limited():
+    index = make_index("ABC123", "ABC124", "ABD125")
+    assert index.search("ABC123", max_distance=2) == [("ABC123", 0), ("ABC124", 1), ("ABD125", 2)]
+    assert index.search("ABC123", max_distance=2, limit=1) == [("ABC123", 0)]
+
+
+def test_short_plates_are_searched_without_a_full_scan():
+    rng = random.Random(7)
+    alphabet = "ACEFHJKMNPRTUVWXY3479"
+    plates = ["".join(rng.choice(alphabet) for _ in range(rng.choice((6, 7)))) for _ in range(5000)]
+    plates += ["ABC123", "ABC1234"]
+    index = make_index(*plates)
+    for query, max_distance in (("ABX12Y", 2), ("AXC1Y3Z", 3)):
+        canonical = canonical_plate(query)
+        assert len(index._candidates(canonical, max_distance)) < len(index) // 5
+        expected = {p for p in plates if edit_distance(canonical, canonical_plate(p)) <= max_distance}
+        assert {p for p, _ in index.search(query, max_distance, limit=len(index))} == expected
+    assert ("ABC123", 2) in index.search("ABX12Y")
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+# Plain timestamp format used across the LPR and access-log tables.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_utc_time(value):
+    """Parse a UNIX timestamp, '%Y-%m-%d %H:%M:%S' or ISO 8601 into naive UTC.
+
+    Numeric strings are read as UNIX seconds, a trailing "Z" is accepted and
+    timezone-aware values are converted to UTC.  Raises ValueError otherwise.
+    """
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.utcfromtimestamp(value)
+        except (OverflowError, OSError, ValueError):
+            raise ValueError("timestamp out of range")
+    if not isinstance(value, str):
+        raise ValueError("timestamp must be a string or a UNIX timestamp")
+    try:
+        return datetime.strptime(value, TIME_FORMAT)
+    except ValueError:
+        pass
+    ts = datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith(("Z", "z")) else value)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts